@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,13 +79,42 @@ WSGI_APPLICATION = 'FermentationController.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connections are tuned for concurrent use (WAL etc.) by core.db.configure_sqlite.
+# IMMEDIATE transactions take the write lock up front, so a writer waits for the
+# busy timeout instead of failing when it upgrades from a read lock.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Temperature time series, kept apart from the configuration and event log
+    'history': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'data' / 'history.db',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.HistoryRouter']
+
+# Touched whenever the device configuration changes (see core.registry)
+CONFIG_VERSION_FILE = BASE_DIR / 'data' / 'config.version'
+# Bumped whenever the controller writes device state or the log (ETags of the status API)
+STATE_VERSION_FILE = BASE_DIR / 'data' / 'state.version'
+
+# Current device state published by the controller for live dashboards (core.live)
+LIVE_STATE_FILE = BASE_DIR / 'data' / 'live_state.json'
+
+# Bumped by the dashboard to ask the controller to reset the safety interlock (core.safety)
+SAFETY_RESET_FILE = BASE_DIR / 'data' / 'safety.reset'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -128,6 +158,24 @@ STATICFILES_DIRS = [
 # Directory where static files will be collected during collectstatic
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    # plotly.js from the installed plotly package, served as js/plotly.min.js
+    'dashboard.finders.PlotlyFinder',
+]
+
+# Collected files get content-hashed names, which WhiteNoise serves with
+# far-future cache headers, so tablets download plotly.js only once per version.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
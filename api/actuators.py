@@ -0,0 +1,42 @@
+"""
+Batched output writes. An OutputBatch holds one tick's relay and valve changes
+and sends them to EVOK in a single bulk request, so every output switches at
+nearly the same moment and a tick costs one round trip however many tanks
+changed. If the bulk request fails, the outputs are written one by one,
+concurrently.
+"""
+import asyncio
+
+
+class OutputBatch:
+    """
+    Output changes collected for one commit.
+    :param values: Optional initial dict of circuit -> value.
+    """
+
+    def __init__(self, values=None):
+        self.values = {}
+        for circuit, value in (values or {}).items():
+            self.set(circuit, value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def set(self, circuit, value):
+        """Records the value for a circuit; a later set() for the same circuit wins."""
+        self.values[circuit] = int(value)
+
+    async def commit(self, client):
+        """
+        Writes the batch.
+        :param client: AsyncEvokClient to write through.
+        :return: Dict of circuit -> True/False for every circuit in the batch.
+        """
+        if not self.values:
+            return {}
+        results = await client.set_relays(self.values)
+        if results is None:
+            print(f"Writing {len(self.values)} outputs one by one.")
+            written = await asyncio.gather(*(client.set_relay(circuit, value) for circuit, value in self.values.items()))
+            results = dict(zip(self.values, written))
+        return results
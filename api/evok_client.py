@@ -1,96 +1,940 @@
-import requests
-import json
+import asyncio
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
 
-EVOK_BASE_URL = "http://192.168.2.77:8080/json"
+import aiohttp
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential
 
+from api.actuators import OutputBatch
 
-class EvokClient:
-    def __init__(self, base_url=EVOK_BASE_URL):
-        self.base_url = base_url
+# Default unit; devices without an EvokUnit are on this one
+EVOK_BASE_URL = os.environ.get("EVOK_BASE_URL", "http://192.168.2.77:8080/json")
+
+# Connection handling
+EVOK_CONNECT_TIMEOUT = 0.25  # seconds, below core.config.CYCLE_DEADLINE
+EVOK_READ_TIMEOUT = 2.0  # seconds
+EVOK_POOL_SIZE = 10
+EVOK_RETRY_ATTEMPTS = 3
+EVOK_RETRY_BACKOFF = 0.05  # seconds, doubled after every failed attempt
+EVOK_RETRY_BACKOFF_MAX = 0.5  # seconds
+EVOK_BREAKER_THRESHOLD = 5  # consecutive failures before the breaker opens
+EVOK_BREAKER_RESET = 10.0  # seconds before a trial request is let through
+EVOK_CONCURRENCY = 16  # simultaneous requests during a fan-out read
+EVOK_WS_RECONNECT_DELAY = 1.0  # seconds between WebSocket reconnect attempts
+EVOK_WS_HEARTBEAT = 5.0  # seconds between pings; a missed pong drops the socket
+
+# EVOK reports some device types under a different name in the "all" listing
+# than the one used in the per-device URLs (/di/<circuit>, /ro/<circuit>).
+DEVICE_TYPE_ALIASES = {
+    "input": "di",
+    "relay": "ro",
+}
+SENSOR_DEVICE_TYPES = ("data_point", "temp")
+
+
+
+def device_address(unit_id, circuit):
+    """
+    Returns the address the controller uses for a device: the bare circuit on
+    the default unit, "<unit id>/<circuit>" on any other EVOK unit.
+    """
+    return str(circuit) if unit_id is None else f"{unit_id}/{circuit}"
+
+
+def split_address(address):
+    """
+    :return: (unit id, or None for the default unit, circuit)
+    """
+    unit, separator, circuit = str(address).partition("/")
+    return (int(unit), circuit) if separator else (None, unit)
+
+
+SensorReading = namedtuple("SensorReading", ["value", "valid", "timestamp"])
+SensorReading.__doc__ = """
+One sensor sample: the value and 'valid' flag returned by a single EVOK read,
+and the time.time() at which it was taken. value is None if the read failed.
+"""
+
+
+class EvokSnapshot:
+    """
+    Read-only state of every device on the unit, fetched with a single request.
+
+    Devices are indexed by (device type, circuit) and exposed through the same
+    read methods as EvokClient, so controllers can use either one as a source.
+    """
+
+    def __init__(self, devices, taken_at=None):
+        index = {}
+        for device in devices:
+            dev = DEVICE_TYPE_ALIASES.get(device.get("dev"), device.get("dev"))
+            circuit = device.get("circuit")
+            if dev is None or circuit is None:
+                continue
+            index[(dev, str(circuit))] = MappingProxyType(dict(device))
+        self._devices = MappingProxyType(index)
+        self._readings = {}
+        self.taken_at = taken_at if taken_at is not None else time.time()
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, key):
+        return key in self._devices
+
+    def devices(self):
+        """Returns the raw state of every device in the snapshot."""
+        return list(self._devices.values())
+
+    def get(self, dev, circuit):
+        """
+        Returns the raw device state for the given type and circuit.
+        :param dev: Device type as used in EVOK URLs (e.g., 'di', 'ro', 'data_point').
+        :param circuit: The circuit ID of the device.
+        :return: A read-only mapping, or None if the device is not in the snapshot.
+        """
+        return self._devices.get((dev, str(circuit)))
+
+    def _sensor(self, circuit):
+        for dev in SENSOR_DEVICE_TYPES:
+            device = self.get(dev, circuit)
+            if device is not None:
+                return device
+        return None
+
+    def get_sensor_reading(self, circuit):
+        """
+        Returns the sensor's SensorReading from this snapshot. Every consumer in the
+        cycle gets the same reading object.
+        """
+        reading = self._readings.get(circuit)
+        if reading is None:
+            device = self._sensor(circuit)
+            if device is None:
+                reading = SensorReading(None, False, self.taken_at)
+            else:
+                reading = SensorReading(device.get("value"), device.get("valid", False), self.taken_at)
+            self._readings[circuit] = reading
+        return reading
 
     def get_sensor_status(self, circuit):
+        return self.get_sensor_reading(circuit).valid
+
+    def get_temperature(self, circuit):
+        return self.get_sensor_reading(circuit).value
+
+    def get_digital_input_state(self, circuit):
+        """
+        Returns the input's value, or 1 if it was seen active since the previous
+        snapshot (see EvokSubscription), so short pulses are not lost.
+        """
+        device = self.get("di", circuit)
+        if device is None:
+            return None
+        if device.get("seen_active"):
+            return 1
+        return device.get("value", False)
+
+    def get_relay_state(self, circuit):
+        device = self.get("ro", circuit)
+        if device is None:
+            return None
+        return device.get("value", False)
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """Raised without touching the network while the EVOK unit is considered down."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated transport errors so an unresponsive unit does not
+    stall every cycle for the full timeout. After reset_timeout one trial request
+    is let through; its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=EVOK_BREAKER_THRESHOLD, reset_timeout=EVOK_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Returns True if a request may be sent now."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """
+        Frees the half-open trial slot after a request that says nothing about
+        the unit's health (e.g. a 4xx answer), so the next request can try again.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class EndpointStats:
+    """Request, failure and latency counters for one EVOK endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency, failed=False):
+        self.requests += 1
+        self.failures += int(failed)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "avg_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+def _is_transient(exc):
+    """Connection errors, timeouts and 5xx responses are worth retrying."""
+    if isinstance(exc, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status >= 500
+    return False
+
+
+# Errors every read/write method turns into its "no data" return value
+REQUEST_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, ValueError)
+
+
+def websocket_url(base_url):
+    """Derives EVOK's WebSocket URL (ws://host:port/ws) from the JSON API base URL."""
+    scheme, rest = base_url.split("://", 1)
+    host = rest.split("/", 1)[0]
+    return f"{'wss' if scheme == 'https' else 'ws'}://{host}/ws"
+
+
+class EvokSubscription:
+    """
+    Device state table kept current by the push events on EVOK's WebSocket.
+    After every (re)connect the table is seeded with one "all devices" read and
+    then updated from the events, so reading it costs no requests. While the
+    socket is down, ready is False, callers poll instead and the subscription
+    reconnects in the background.
+
+    The table only holds the latest value, so a digital input that goes active
+    and back between two reads would be missed. Inputs seen active in any event
+    are latched until the next snapshot(), which reports them as seen_active.
+    """
+
+    def __init__(self, client, url=None, reconnect_delay=EVOK_WS_RECONNECT_DELAY, heartbeat=EVOK_WS_HEARTBEAT):
+        """
+        :param client: The AsyncEvokClient whose session and "all" endpoint are used.
+        :param url: WebSocket URL, derived from the client's base URL by default.
+        """
+        self.client = client
+        self.url = url or websocket_url(client.base_url)
+        self.reconnect_delay = reconnect_delay
+        self.heartbeat = heartbeat
+        self.ready = False
+        self.connects = 0
+        self.drops = 0
+        self.events = 0
+        self._devices = {}
+        self._seen_active = set()
+        self._task = None
+
+    def snapshot(self):
+        """
+        Returns the current table as an EvokSnapshot. Digital inputs that were
+        active at any point since the previous call are marked seen_active.
+        """
+        seen_active, self._seen_active = self._seen_active, set()
+        return EvokSnapshot([
+            dict(device, seen_active=True) if key in seen_active else device
+            for key, device in self._devices.items()
+        ])
+
+    def _apply(self, data):
+        if isinstance(data, dict):
+            data = [data] if "dev" in data else data.get("data", [])
+        for device in data:
+            dev = DEVICE_TYPE_ALIASES.get(device.get("dev"), device.get("dev"))
+            circuit = device.get("circuit")
+            if dev is None or circuit is None:
+                continue
+            key = (dev, str(circuit))
+            # Events may carry only the fields that changed
+            self._devices[key] = dict(self._devices.get(key, {}), **device)
+            if dev == "di" and self._devices[key].get("value"):
+                self._seen_active.add(key)
+
+    def _apply_message(self, data):
+        # One malformed event must not end the subscription
+        try:
+            self._apply(data)
+        except (AttributeError, TypeError, ValueError) as e:
+            print(f"Ignoring malformed EVOK event from {self.url}: {e}")
+
+    async def _listen(self, session):
+        async with session.ws_connect(self.url, heartbeat=self.heartbeat) as ws:
+            self.connects += 1
+            self._devices = {}
+            self._apply_message(await self.client._request("GET", "all"))
+            self.ready = True
+            print(f"Subscribed to EVOK events at {self.url}.")
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    self.events += 1
+                    try:
+                        data = message.json()
+                    except ValueError as e:
+                        print(f"Ignoring malformed EVOK event from {self.url}: {e}")
+                        continue
+                    self._apply_message(data)
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    break
+
+    async def run(self):
+        """Keeps the subscription up until cancelled."""
+        while True:
+            try:
+                await self._listen(await self.client._get_session())
+                print(f"EVOK WebSocket at {self.url} closed, polling until it reconnects.")
+            except REQUEST_ERRORS as e:
+                print(f"EVOK WebSocket at {self.url} unavailable ({e}), polling until it reconnects.")
+            finally:
+                if self.ready:
+                    self.drops += 1
+                self.ready = False
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        """Starts the subscription on the running loop."""
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get_stats(self):
+        return {"ready": self.ready, "connects": self.connects, "drops": self.drops, "events": self.events}
+
+
+class AsyncEvokClient:
+    """
+    asyncio client for the EVOK JSON API. Owns a keep-alive connection pool,
+    retries transient failures and shares one circuit breaker across requests.
+    """
+
+    def __init__(self, base_url=EVOK_BASE_URL, connect_timeout=EVOK_CONNECT_TIMEOUT,
+                 read_timeout=EVOK_READ_TIMEOUT, retries=EVOK_RETRY_ATTEMPTS,
+                 pool_size=EVOK_POOL_SIZE, concurrency=EVOK_CONCURRENCY, breaker=None):
+        self.base_url = base_url
+        self.timeout = aiohttp.ClientTimeout(total=None, connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self.subscription = None
+        self._session = None
+        self._semaphore = None
+
+    async def _get_session(self):
+        # The session and semaphore are bound to the running loop, so create them lazily
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={"Accept": "application/json"},
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    def _endpoint_stats(self, endpoint):
+        with self._stats_lock:
+            if endpoint not in self.stats:
+                self.stats[endpoint] = EndpointStats()
+            return self.stats[endpoint]
+
+    async def _send(self, session, method, url, **kwargs):
+        async with self._semaphore:
+            async with session.request(method, url, raise_for_status=True, **kwargs) as response:
+                return await response.json(content_type=None)
+
+    async def _request(self, method, path, **kwargs):
+        """
+        Sends a request through the pooled session with retries and the circuit breaker.
+        :param method: HTTP method.
+        :param path: Path relative to base_url (e.g., 'di/1_01').
+        :return: The decoded JSON body.
+        :raises aiohttp.ClientError: On failure, including CircuitOpenError.
+        """
+        endpoint = path.split("/", 1)[0]
+        stats = self._endpoint_stats(endpoint)
+        if not self.breaker.allow():
+            stats.record(0.0, failed=True)
+            raise CircuitOpenError(f"EVOK unit at {self.base_url} is unavailable, not sending {method} {path}")
+
+        def count_retry(retry_state):
+            stats.retries += 1
+
+        session = await self._get_session()
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.retries),
+            wait=wait_exponential(multiplier=EVOK_RETRY_BACKOFF, max=EVOK_RETRY_BACKOFF_MAX),
+            retry=retry_if_exception(_is_transient),
+            before_sleep=count_retry,
+            reraise=True,
+        )
+        start = time.perf_counter()
+        # Only transient errors count against the unit. A read cancelled at a
+        # cycle deadline may never have left the semaphore, and a dead unit
+        # fails its connect (EVOK_CONNECT_TIMEOUT) before the deadline anyway.
+        outcome = "released"
+        try:
+            data = await retrying(self._send, session, method, f"{self.base_url}/{path}", **kwargs)
+            outcome = "success"
+            return data
+        except REQUEST_ERRORS as e:
+            if _is_transient(e):
+                outcome = "failure"
+            raise
+        finally:
+            # Always settle the breaker, so a half-open trial never stays in flight
+            stats.record(time.perf_counter() - start, failed=outcome != "success")
+            if outcome == "success":
+                self.breaker.record_success()
+            elif outcome == "failure":
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_trial()
+
+    def get_stats(self):
+        """
+        Returns per-endpoint request counters and latencies (in seconds).
+        """
+        with self._stats_lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self.stats.items()}
+
+    async def get_sensor_reading(self, circuit):
+        """
+        Reads the value and validity of an xG18 sensor with one request.
+        :param circuit: The circuit ID of the sensor (e.g., 'xG18_1').
+        :return: A SensorReading; on error the value is None and it is marked invalid.
+        """
+        try:
+            data = await self._request("GET", f"data_point/{circuit}")
+            # Default to invalid if 'valid' is not present
+            return SensorReading(data.get("value"), data.get("valid", False), time.time())
+        except REQUEST_ERRORS as e:
+            print(f"Error reading sensor {circuit}: {e}")
+            return SensorReading(None, False, time.time())
+
+    async def get_sensor_status(self, circuit):
         """
         Checks the validity of the sensor's data using the 'valid' parameter from EVOK API.
         :param circuit: The circuit ID of the sensor.
         :return: False if the data is invalid, True otherwise.
         """
-        url = f"{self.base_url}/data_point/{circuit}"
-        try:
-            response = requests.get(url, headers={"Accept": "application/json"})
-            response.raise_for_status()
-            data = response.json()
-            return data.get("valid", False)  # Default to False if 'valid' is not present
-        except requests.RequestException as e:
-            print(f"Error fetching status for sensor {circuit}: {e}")
-            return False  # Treat as invalid in case of an error
+        return (await self.get_sensor_reading(circuit)).valid
 
-    def get_temperature(self, circuit):
+    async def get_temperature(self, circuit):
         """
         Reads temperature data from an xG18 sensor via EVOK API.
         :param circuit: The circuit ID of the sensor (e.g., 'xG18_1').
         :return: The temperature value or None on error.
         """
-        url = f"{self.base_url}/data_point/{circuit}"
-        try:
-            response = requests.get(url, headers={"Accept": "application/json"})
-            response.raise_for_status()
-            data = response.json()
-            return data.get("value")
-        except (requests.RequestException, KeyError) as e:
-            print(f"Error reading temperature for circuit {circuit}: {e}")
-            return None
+        return (await self.get_sensor_reading(circuit)).value
 
-    def set_relay(self, circuit, value):
-        url = f"{self.base_url}/ro/{circuit}"
-        payload = {"value": value}
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
+    async def set_relay(self, circuit, value):
         try:
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
-            response.raise_for_status()
+            await self._request("POST", f"ro/{circuit}", json={"value": value})
             return True
-        except requests.RequestException as e:
+        except REQUEST_ERRORS as e:
             print(f"Error setting relay {circuit} to {value}: {e}")
             return False
 
-    def get_digital_input_state(self, circuit):
+    async def set_relays(self, values):
+        """
+        Sets several relays with one request to EVOK's bulk endpoint.
+        :param values: Dict of circuit -> value.
+        :return: Dict of circuit -> True/False, or None if the bulk request failed.
+        """
+        body = {
+            "individual_assignments": [
+                {"device_type": "relay", "device_circuit": circuit, "assigned_values": {"value": int(value)}}
+                for circuit, value in values.items()
+            ]
+        }
+        try:
+            data = await self._request("POST", "bulk", json=body)
+        except REQUEST_ERRORS as e:
+            print(f"Error setting {len(values)} relays with a bulk request: {e}")
+            return None
+        assignments = data.get("individual_assignments", []) if isinstance(data, dict) else []
+        failed = {item.get("device_circuit") for item in assignments if isinstance(item, dict) and item.get("error")}
+        return {circuit: circuit not in failed for circuit in values}
+
+    async def get_digital_input_state(self, circuit):
         """
         Reads the state of a digital input from EVOK API.
         :param circuit: The circuit ID of the digital input (e.g., '1_01').
         :return: True if active, False if inactive, or None on error.
         """
-        url = f"{self.base_url}/di/{circuit}"
         try:
-            response = requests.get(url, headers={"Accept": "application/json"})
-            response.raise_for_status()
-            data = response.json()
+            data = await self._request("GET", f"di/{circuit}")
             return data.get("value", False)
-        except requests.RequestException as e:
+        except REQUEST_ERRORS as e:
             print(f"Error reading digital input state for circuit {circuit}: {e}")
             return None
 
-    def get_relay_state(self, circuit):
+    async def get_relay_state(self, circuit):
         """
         Reads the state of a relay from EVOK API.
         :param circuit: The circuit ID of the relay (e.g., '1_01').
         :return: True if active, False if inactive, or None on error.
         """
-        url = f"{self.base_url}/ro/{circuit}"
         try:
-            response = requests.get(url, headers={"Accept": "application/json"})
-            response.raise_for_status()
-            data = response.json()
+            data = await self._request("GET", f"ro/{circuit}")
             return data.get("value", False)
-        except requests.RequestException as e:
+        except REQUEST_ERRORS as e:
             print(f"Error reading relay state for circuit {circuit}: {e}")
             return None
 
+    async def subscribe(self, **kwargs):
+        """
+        Starts an EvokSubscription. While it is up, get_snapshot() returns its
+        state table instead of sending a request.
+        :param kwargs: Passed to EvokSubscription.
+        """
+        if self.subscription is None:
+            self.subscription = EvokSubscription(self, **kwargs)
+            self.subscription.start()
+        return self.subscription
+
+    async def get_snapshot(self):
+        """
+        Reads the state of every device on the unit with a single request, or
+        from the WebSocket state table while subscribed.
+        :return: An EvokSnapshot, or None on error.
+        """
+        if self.subscription is not None and self.subscription.ready:
+            return self.subscription.snapshot()
+        try:
+            data = await self._request("GET", "all")
+            if isinstance(data, dict):
+                data = data.get("data", [])
+            return EvokSnapshot(data)
+        except REQUEST_ERRORS as e:
+            print(f"Error reading device snapshot: {e}")
+            return None
+
+    async def read_state(self, devices, deadline=None):
+        """
+        Reads one cycle's device state: from the subscription table or with one
+        "all devices" request, falling back to reading the given devices
+        concurrently. Both count against the deadline.
+        :param devices: (device type, circuit) pairs to read if the listing is unavailable.
+        :param deadline: Seconds for the whole read, or None to wait for every device.
+        :return: An EvokSnapshot with the devices that answered in time.
+        """
+        start = time.monotonic()
+        try:
+            snapshot = await asyncio.wait_for(self.get_snapshot(), deadline)
+        except asyncio.TimeoutError:
+            print(f"Device listing from {self.base_url} missed the {deadline}s cycle deadline.")
+            snapshot = None
+        if snapshot is not None:
+            return snapshot
+        remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - start))
+        return await self.read_devices(devices, remaining)
+
+    async def _read_device(self, dev, circuit):
+        data = await self._request("GET", f"{dev}/{circuit}")
+        return dict(data, dev=dev, circuit=circuit)
+
+    async def read_devices(self, devices, deadline=None):
+        """
+        Reads many devices concurrently, at most `concurrency` requests at a time.
+        Reads that fail or are still running when the deadline expires are left
+        out of the result, so callers see them as "no data" for this cycle.
+        :param devices: Iterable of (device type, circuit) pairs, e.g. ('di', '1_01').
+        :param deadline: Seconds to wait for the whole batch, or None to wait for every read.
+        :return: An EvokSnapshot with the devices that answered in time.
+        """
+        await self._get_session()
+        tasks = [asyncio.create_task(self._read_device(dev, circuit)) for dev, circuit in set(devices)]
+        if not tasks:
+            return EvokSnapshot([])
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+            print(f"{len(pending)} device reads missed the {deadline}s cycle deadline.")
+        states = []
+        for task in done:
+            if task.exception() is None:
+                states.append(task.result())
+        return EvokSnapshot(states)
+
+    async def close(self):
+        if self.subscription is not None:
+            await self.subscription.stop()
+            self.subscription = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class EvokClient:
+    """
+    Blocking interface to the EVOK API. Every call is a thin wrapper that runs
+    the matching AsyncEvokClient coroutine on a private event loop thread, so
+    sync callers share the async client's connection pool, retries and breaker.
+    """
+
+    def __init__(self, base_url=EVOK_BASE_URL, thread_name="evok-client", **kwargs):
+        self.aio = AsyncEvokClient(base_url, **kwargs)
+        self.thread_name = thread_name
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return self.aio.base_url
+
+    @property
+    def breaker(self):
+        return self.aio.breaker
+
+    @property
+    def subscription(self):
+        return self.aio.subscription
+
+    def _run(self, coro):
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name=self.thread_name, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get_stats(self):
+        return self.aio.get_stats()
+
+    def get_sensor_reading(self, circuit):
+        return self._run(self.aio.get_sensor_reading(circuit))
+
+    def get_sensor_status(self, circuit):
+        return self._run(self.aio.get_sensor_status(circuit))
+
+    def get_temperature(self, circuit):
+        return self._run(self.aio.get_temperature(circuit))
+
+    def set_relay(self, circuit, value):
+        return self._run(self.aio.set_relay(circuit, value))
+
+    def set_relays(self, values):
+        return self._run(self.aio.set_relays(values))
+
+    def write_outputs(self, values):
+        """
+        Writes a dict of circuit -> value as one OutputBatch.
+        :return: Dict of circuit -> True/False for every circuit.
+        """
+        return self._run(OutputBatch(values).commit(self.aio))
+
+    def get_digital_input_state(self, circuit):
+        return self._run(self.aio.get_digital_input_state(circuit))
+
+    def get_relay_state(self, circuit):
+        return self._run(self.aio.get_relay_state(circuit))
+
+    def get_snapshot(self):
+        return self._run(self.aio.get_snapshot())
+
+    def subscribe(self, **kwargs):
+        return self._run(self.aio.subscribe(**kwargs))
+
+    def read_devices(self, devices, deadline=None):
+        return self._run(self.aio.read_devices(devices, deadline))
+
+    def read_state(self, devices, deadline=None):
+        return self._run(self.aio.read_state(devices, deadline))
+
+    def _clients(self):
+        return [self.aio]
+
+    def close(self):
+        """Closes the connection pools and stops the event loop thread."""
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            for client in self._clients():
+                asyncio.run_coroutine_threadsafe(client.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+def _qualify(snapshot, unit_id):
+    """Returns the snapshot's devices with their circuits replaced by addresses."""
+    if unit_id is None:
+        return snapshot.devices()
+    return [dict(device, circuit=device_address(unit_id, device["circuit"])) for device in snapshot.devices()]
+
+
+class MultiUnitClient(EvokClient):
+    """
+    EvokClient for devices spread over several EVOK units. Every unit gets its
+    own AsyncEvokClient - connection pool, retries, circuit breaker and
+    counters - and all of them run on this client's event loop thread, so the
+    units are read and written concurrently and a slow or dead unit only costs
+    its own devices for the cycle.
+
+    Devices are named by address (see device_address); bare circuits are on
+    the default unit at base_url.
+    """
+
+    def __init__(self, base_url=EVOK_BASE_URL, units=None, thread_name="evok-client", **kwargs):
+        """
+        :param units: Dict of unit id -> (name, base URL) for the other units.
+        :param kwargs: AsyncEvokClient options, used for every unit.
+        """
+        super().__init__(base_url, thread_name=thread_name, **kwargs)
+        self.client_kwargs = kwargs
+        self.units = {None: self.aio}
+        self.unit_names = {None: "default"}
+        self._subscribe_kwargs = None
+        self.set_units(units or {})
+
+    def _clients(self):
+        return list(self.units.values())
+
+    def set_units(self, units):
+        """
+        Configures the other units. Units whose URL did not change keep their
+        client, and with it their connections and health state.
+        :param units: Dict of unit id -> (name, base URL).
+        """
+        current = dict(self.units)
+        updated = {None: self.aio}
+        for unit_id, (name, base_url) in units.items():
+            client = current.get(unit_id)
+            if client is None or client.base_url != base_url:
+                client = AsyncEvokClient(base_url, **self.client_kwargs)
+                if self._subscribe_kwargs is not None:
+                    self._run(client.subscribe(**self._subscribe_kwargs))
+            updated[unit_id] = client
+        retired = [client for client in current.values() if client not in updated.values()]
+        self.units = updated
+        self.unit_names = {None: "default", **{unit_id: name for unit_id, (name, _) in units.items()}}
+        if self._loop is not None:
+            for client in retired:
+                self._run(client.close())
+
+    def _group(self, items):
+        """Splits (address, value) pairs by unit: {unit id: {circuit: (address, value)}}."""
+        groups = {}
+        for address, value in items:
+            unit_id, circuit = split_address(address)
+            groups.setdefault(unit_id, {})[circuit] = (address, value)
+        return groups
+
+    async def _device_call(self, method, address, *args):
+        unit_id, circuit = split_address(address)
+        client = self.units.get(unit_id)
+        if client is None:
+            print(f"Device {address} is on unknown EVOK unit {unit_id}.")
+            return None
+        return await getattr(client, method)(circuit, *args)
+
+    def get_sensor_reading(self, address):
+        reading = self._run(self._device_call("get_sensor_reading", address))
+        return reading if reading is not None else SensorReading(None, False, time.time())
+
+    def get_sensor_status(self, address):
+        return self.get_sensor_reading(address).valid
+
+    def get_temperature(self, address):
+        return self.get_sensor_reading(address).value
+
+    def set_relay(self, address, value):
+        return bool(self._run(self._device_call("set_relay", address, value)))
+
+    def get_digital_input_state(self, address):
+        return self._run(self._device_call("get_digital_input_state", address))
+
+    def get_relay_state(self, address):
+        return self._run(self._device_call("get_relay_state", address))
+
+    async def _per_unit(self, groups, call):
+        """Runs call(client, circuits) for every unit in groups concurrently."""
+        unit_ids = [unit_id for unit_id in groups if unit_id in self.units]
+        for unit_id in groups.keys() - self.units.keys():
+            print(f"Skipping devices on unknown EVOK unit {unit_id}.")
+        results = await asyncio.gather(*(call(self.units[unit_id], groups[unit_id]) for unit_id in unit_ids))
+        return dict(zip(unit_ids, results))
+
+    async def _read(self, method, devices, deadline):
+        groups = {}
+        for dev, address in devices:
+            unit_id, circuit = split_address(address)
+            groups.setdefault(unit_id, []).append((dev, circuit))
+        snapshots = await self._per_unit(groups, lambda client, unit_devices: getattr(client, method)(unit_devices, deadline))
+        return EvokSnapshot([device for unit_id, snapshot in snapshots.items() for device in _qualify(snapshot, unit_id)])
+
+    def read_devices(self, devices, deadline=None):
+        return self._run(self._read("read_devices", devices, deadline))
+
+    def read_state(self, devices, deadline=None):
+        return self._run(self._read("read_state", devices, deadline))
+
+    async def _get_snapshot(self):
+        snapshots = await self._per_unit({unit_id: None for unit_id in self.units}, lambda client, _: client.get_snapshot())
+        snapshots = {unit_id: snapshot for unit_id, snapshot in snapshots.items() if snapshot is not None}
+        if not snapshots:
+            return None
+        return EvokSnapshot([device for unit_id, snapshot in snapshots.items() for device in _qualify(snapshot, unit_id)])
+
+    def get_snapshot(self):
+        """Reads every unit's device listing; units that fail are left out. None if all fail."""
+        return self._run(self._get_snapshot())
+
+    async def _write(self, values, write):
+        """
+        Runs write(client, {circuit: value}) for every unit concurrently.
+        :return: Dict of address -> True/False, or None if any unit's write returned None.
+        """
+        groups = self._group(values.items())
+        written = await self._per_unit(
+            groups, lambda client, circuits: write(client, {circuit: value for circuit, (_, value) in circuits.items()})
+        )
+        results = {address: False for address in values}
+        for unit_id, unit_results in written.items():
+            if unit_results is None:
+                return None
+            for circuit, success in unit_results.items():
+                results[groups[unit_id][circuit][0]] = success
+        return results
+
+    def set_relays(self, values):
+        return self._run(self._write(values, lambda client, unit_values: client.set_relays(unit_values)))
+
+    def write_outputs(self, values):
+        """
+        Writes a dict of address -> value: one OutputBatch per unit, all units at once.
+        :return: Dict of address -> True/False for every address.
+        """
+        return self._run(self._write(values, lambda client, unit_values: OutputBatch(unit_values).commit(client)))
+
+    def subscribe(self, **kwargs):
+        """Subscribes to the events of every unit, now and as units are added."""
+        self._subscribe_kwargs = kwargs
+        for client in self._clients():
+            self._run(client.subscribe(**kwargs))
+        return self.aio.subscription
+
+    def get_stats(self):
+        """Per-endpoint counters; endpoints of the other units are prefixed with the unit name."""
+        stats = {}
+        for unit_id, client in self.units.items():
+            prefix = "" if unit_id is None else f"{self.unit_names[unit_id]}:"
+            stats.update({prefix + endpoint: values for endpoint, values in client.get_stats().items()})
+        return stats
+
+    def get_unit_health(self):
+        """
+        :return: Dict of unit name -> base URL, circuit breaker state and
+            consecutive failures.
+        """
+        return {
+            self.unit_names[unit_id]: {
+                "base_url": client.base_url,
+                "state": client.breaker.state,
+                "failures": client.breaker.failures,
+            }
+            for unit_id, client in self.units.items()
+        }
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide MultiUnitClient, so every caller shares the
+    connection pool, circuit breaker and counters of each unit. Its units are
+    kept in step with the configured EvokUnits by core.registry.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = MultiUnitClient()
+        return _shared_client
+
+
+def set_client(client):
+    """
+    Replaces the process-wide client, e.g. with a client for a stand-in server
+    or api.simulator.SimulatedEvokClient.
+    :return: The previous client, or None.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        previous, _shared_client = _shared_client, client
+        return previous
+
 
 # Test
 if __name__ == "__main__":
-    client = EvokClient()
+    client = get_client()
 
     # Test temperature reading from xG18 module
     sensor_circuit = "xG18_1"
@@ -100,4 +944,5 @@ if __name__ == "__main__":
     # Test relay setting
     relay_circuit = "2_01"
     result = client.set_relay(relay_circuit, 1)
-    print(f"Relay {relay_circuit} set to ON: {'Success' if result else 'Failed'}")
\ No newline at end of file
+    print(f"Relay {relay_circuit} set to ON: {'Success' if result else 'Failed'}")
+    print(f"Endpoint stats: {client.get_stats()}")
\ No newline at end of file
@@ -0,0 +1,194 @@
+import asyncio
+import random
+import threading
+
+from aiohttp import web
+
+from api.evok_client import DEVICE_TYPE_ALIASES
+
+# Device type names used in the "all" listing, keyed by the URL name
+LISTING_NAMES = {url_name: name for name, url_name in DEVICE_TYPE_ALIASES.items()}
+
+
+class EvokStandIn:
+    """
+    Local asyncio stand-in for an EVOK unit. Serves the subset of the JSON API the
+    controller uses (/json/all, /json/bulk and /json/<dev>/<circuit>) from an
+    in-memory table, and pushes every device change to the clients of /ws.
+
+    :param latency: Seconds added to every response.
+    :param jitter: Up to this many extra seconds, drawn uniformly per request.
+    :param error_rate: Fraction of requests answered with HTTP 500.
+    :param listing: Serve /json/all; without it clients have to read devices one by one.
+    :param bulk: Serve /json/bulk; without it clients have to write devices one by one.
+    :param websocket: Serve /ws; without it clients have to poll.
+    :param seed: Seed for the jitter and error draws, for repeatable runs.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, listing=True, bulk=True, websocket=True, seed=None):
+        self.devices = {}
+        self.delays = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.listing = listing
+        self.bulk = bulk
+        self.websocket = websocket
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.error_count = 0
+        self.bulk_count = 0
+        self._websockets = set()
+        self._runner = None
+        self._loop = None
+        self._thread = None
+
+    def add_device(self, dev, circuit, delay=0.0, **state):
+        """
+        Adds a device to the stand-in.
+        :param dev: Device type as used in EVOK URLs (e.g., 'di', 'ro', 'data_point').
+        :param circuit: The circuit ID of the device.
+        :param delay: Seconds to wait before answering requests for this device.
+        :param state: Initial device state (e.g., value=1, valid=True).
+        """
+        self.devices[(dev, circuit)] = {"dev": LISTING_NAMES.get(dev, dev), "circuit": circuit, **state}
+        if delay:
+            self.delays[(dev, circuit)] = delay
+
+    def add_devices(self, dev, circuits, **state):
+        """Adds several devices of one type with the same initial state."""
+        for circuit in circuits:
+            self.add_device(dev, circuit, **state)
+
+    def set_value(self, dev, circuit, value):
+        """Changes a device's value, e.g. to move a simulated temperature."""
+        device = self.devices[(dev, circuit)]
+        device["value"] = value
+        self._notify(device)
+
+    def _notify(self, device):
+        self.send_event([dict(device)])
+
+    def send_event(self, data):
+        """Pushes data as is to every WebSocket client, e.g. to send a malformed event."""
+        # Called from the tests' thread as well as from handlers on the server loop
+        if self._websockets and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._broadcast, data)
+
+    def _broadcast(self, data):
+        for ws in list(self._websockets):
+            if not ws.closed:
+                asyncio.ensure_future(ws.send_json(data))
+
+    def drop_websockets(self):
+        """Closes every open WebSocket, as if the link had dropped."""
+        for ws in list(self._websockets):
+            asyncio.run_coroutine_threadsafe(ws.close(), self._loop).result()
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get("/json/all", self.handle_all)
+        app.router.add_post("/json/bulk", self.handle_bulk)
+        app.router.add_get("/ws", self.handle_ws)
+        app.router.add_get("/json/{dev}/{circuit}", self.handle_get)
+        app.router.add_post("/json/{dev}/{circuit}", self.handle_post)
+        return app
+
+    async def _simulate_link(self):
+        """Applies the configured latency, jitter and error rate to one request."""
+        self.request_count += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.error_count += 1
+            raise web.HTTPInternalServerError()
+
+    async def handle_all(self, request):
+        await self._simulate_link()
+        if not self.listing:
+            raise web.HTTPNotFound()
+        return web.json_response({"data": list(self.devices.values())})
+
+    async def handle_bulk(self, request):
+        await self._simulate_link()
+        if not self.bulk:
+            raise web.HTTPNotFound()
+        self.bulk_count += 1
+        body = await request.json()
+        results = []
+        for assignment in body.get("individual_assignments", []):
+            dev = DEVICE_TYPE_ALIASES.get(assignment.get("device_type"), assignment.get("device_type"))
+            circuit = assignment.get("device_circuit")
+            device = self.devices.get((dev, circuit))
+            if device is None:
+                results.append({"device_circuit": circuit, "error": "No such device"})
+                continue
+            device.update(assignment.get("assigned_values", {}))
+            self._notify(device)
+            results.append({"device_circuit": circuit, **device})
+        return web.json_response({"individual_assignments": results})
+
+    async def _device(self, request):
+        await self._simulate_link()
+        key = (request.match_info["dev"], request.match_info["circuit"])
+        if key not in self.devices:
+            raise web.HTTPNotFound()
+        if key in self.delays:
+            await asyncio.sleep(self.delays[key])
+        return self.devices[key]
+
+    async def handle_get(self, request):
+        return web.json_response(await self._device(request))
+
+    async def handle_post(self, request):
+        device = await self._device(request)
+        device.update(await request.json())
+        self._notify(device)
+        return web.json_response(device)
+
+    async def handle_ws(self, request):
+        if not self.websocket:
+            raise web.HTTPNotFound()
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._websockets.add(ws)
+        try:
+            async for message in ws:
+                pass  # Commands from the client are not needed by the controller
+        finally:
+            self._websockets.discard(ws)
+        return ws
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Starts serving on the running loop.
+        :return: The base URL to pass to EvokClient.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}/json"
+
+    async def stop(self):
+        for ws in list(self._websockets):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self, host="127.0.0.1", port=0):
+        """Starts serving from a background thread with its own event loop."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="evok-stand-in", daemon=True)
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(self.start(host, port), self._loop).result()
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,175 @@
+"""
+Safety interlock. SafetyInterlock polls only the safety inputs (the Total Stop
+button) from its own thread, with its own EVOK client, connection pool and
+event loop, so nothing the controller does - slow sensor reads, database
+writes, a long scheduler task - can delay it.
+
+When an input goes active, every relay and valve output is switched off with
+one bulk write and the interlock latches: it stays tripped, and the controller
+keeps its outputs off, until a reset is requested while no input is active.
+
+The reaction time (from the poll that saw the input to the outputs confirmed
+off) is measured for every trip. Its worst case is bounded by the poll period
+plus the client timeouts for one read and one write, and for a controller
+write already in flight when the interlock trips (see write_lock).
+"""
+import threading
+import time
+
+from api.evok_client import EndpointStats
+
+
+class SafetyInterlock:
+    """
+    :param client: EvokClient used only by the interlock.
+    :param input_circuits: Digital input circuits that trip the interlock when active.
+    :param output_circuits: Callable returning every output circuit to switch
+        off. It is called on each trip, so it must not block (no queries).
+    :param period: Seconds between polls.
+    :param deadline: Seconds to wait for the inputs on each poll.
+    :param reaction_budget: Trips that take longer than this are reported.
+    :param max_missed: Trip after this many consecutive polls without an answer
+        from every input; None never trips on lost reads.
+    :param write_lock: Lock held around every off-write. Share it with whatever
+        else writes the outputs (core.outputs.OutputReconciler.write_lock), so
+        a write already in flight finishes before the outputs go off.
+    """
+
+    def __init__(self, client, input_circuits, output_circuits, period=0.02, deadline=0.1,
+                 reaction_budget=0.25, max_missed=None, write_lock=None, clock=time.monotonic):
+        self.client = client
+        self.input_circuits = list(input_circuits)
+        self.output_circuits = output_circuits
+        self.period = period
+        self.deadline = deadline
+        self.reaction_budget = reaction_budget
+        self.max_missed = max_missed
+        self.write_lock = write_lock or threading.Lock()
+        self.clock = clock
+        self.tripped = False
+        self.trip_reason = None
+        self.trips = 0
+        self.overruns = 0
+        self.missed = 0
+        self.last_reaction = None
+        self.poll_stats = EndpointStats()
+        self.reaction_stats = EndpointStats()
+        self._pending_off = {}
+        self._reset_requested = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_tripped(self):
+        return self.tripped
+
+    def poll(self):
+        """
+        Reads the safety inputs once, trips on an active input and, while
+        tripped, retries failed off-writes and handles reset requests.
+        :return: True if the interlock is tripped after the poll.
+        """
+        start = self.clock()
+        snapshot = self.client.read_devices([("di", circuit) for circuit in self.input_circuits], self.deadline)
+        states = {circuit: snapshot.get_digital_input_state(circuit) for circuit in self.input_circuits}
+        active = [circuit for circuit, state in states.items() if state is not None and int(state)]
+        lost = any(state is None for state in states.values())
+        self.missed = self.missed + 1 if lost else 0
+        self.poll_stats.record(self.clock() - start, failed=lost)
+
+        if active:
+            if not self.tripped:
+                self.trip(f"Safety input {', '.join(active)} active", start)
+        elif self.max_missed is not None and self.missed >= self.max_missed and not self.tripped:
+            self.trip(f"No answer from the safety inputs for {self.missed} polls", start)
+
+        if self.tripped:
+            if self._pending_off:
+                self._switch_off(self._pending_off)
+            if self._reset_requested:
+                self._reset_requested = False
+                if active or lost:
+                    print("Safety interlock reset refused: the safety inputs are not all released.")
+                else:
+                    self.tripped = False
+                    self.trip_reason = None
+                    print("Safety interlock reset.")
+        return self.tripped
+
+    def trip(self, reason, detected_at=None):
+        """
+        Latches the interlock and switches every output off with one bulk write.
+        :param reason: Logged and kept in trip_reason.
+        :param detected_at: clock() time the condition was seen, for the reaction time.
+        """
+        detected_at = self.clock() if detected_at is None else detected_at
+        # Latch first, so the controller stops writing outputs before they go off
+        self.tripped = True
+        self.trip_reason = reason
+        self.trips += 1
+        self._switch_off({circuit: 0 for circuit in self.output_circuits()})
+
+        reaction = self.clock() - detected_at
+        self.last_reaction = reaction
+        self.reaction_stats.record(reaction, failed=bool(self._pending_off))
+        print(f"SAFETY INTERLOCK TRIPPED: {reason}. Outputs off in {reaction * 1000:.1f} ms.")
+        if reaction > self.reaction_budget:
+            print(f"Safety reaction {reaction * 1000:.1f} ms exceeded the "
+                  f"{self.reaction_budget * 1000:.0f} ms budget.")
+
+    def _switch_off(self, values):
+        # Latched before taking the lock: writers that get it after us see the trip
+        with self.write_lock:
+            results = self.client.write_outputs(values)
+        self._pending_off = {circuit: 0 for circuit, success in results.items() if not success}
+        if self._pending_off:
+            print(f"Safety interlock could not switch off {', '.join(sorted(self._pending_off))}; retrying.")
+
+    def request_reset(self):
+        """Asks the interlock thread to release the latch on its next poll."""
+        self._reset_requested = True
+
+    def run(self):
+        """Polls at a fixed rate until stop() is called."""
+        next_poll = self.clock()
+        while not self._stop.wait(max(0.0, next_poll - self.clock())):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Safety interlock poll failed: {e}")
+            next_poll += self.period
+            if next_poll < self.clock():
+                # Overran the period; poll again immediately rather than catching up
+                self.overruns += 1
+                next_poll = self.clock()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="safety-interlock", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_stats(self):
+        """
+        Returns the poll and reaction statistics (latencies in seconds).
+        worst_case_reaction adds the poll period (an input can go active right
+        after a read) to the slowest measured reaction, or to the slowest poll
+        before the first trip.
+        """
+        polls = self.poll_stats.as_dict()
+        reactions = self.reaction_stats.as_dict()
+        return {
+            "tripped": self.tripped,
+            "trips": self.trips,
+            "polls": polls["requests"],
+            "lost_polls": polls["failures"],
+            "overruns": self.overruns,
+            "max_poll": polls["max_latency"],
+            "last_reaction": self.last_reaction,
+            "max_reaction": reactions["max_latency"],
+            "worst_case_reaction": self.period + max(reactions["max_latency"], polls["max_latency"]),
+        }
@@ -0,0 +1,58 @@
+from rest_framework import serializers
+
+from core.models import DigitalInput, Log, Relay, Sensor, Tank, Valve
+
+
+class FieldSelectionMixin:
+    """
+    Limits the serialized fields to the comma-separated ?fields= query parameter,
+    e.g. ?fields=name,current_temperature. Unknown names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        selected = request.query_params.get('fields') if request is not None else None
+        if selected:
+            keep = {name.strip() for name in selected.split(',')}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+
+class TankSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    current_temperature = serializers.FloatField(source='sensor.current_temperature', read_only=True, allow_null=True)
+
+    class Meta:
+        model = Tank
+        fields = ['id', 'name', 'target_temperature', 'current_temperature', 'sensor', 'valve']
+
+
+class SensorSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Sensor
+        fields = ['id', 'name', 'circuit', 'current_temperature', 'last_updated', 'min_temp', 'max_temp',
+                  'last_error_time', 'error_active']
+
+
+class ValveSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Valve
+        fields = ['id', 'name', 'circuit', 'is_open', 'last_updated']
+
+
+class DigitalInputSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = DigitalInput
+        fields = ['id', 'name', 'circuit', 'state', 'last_updated']
+
+
+class RelaySerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Relay
+        fields = ['id', 'name', 'circuit', 'is_active', 'last_updated']
+
+
+class LogSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Log
+        fields = ['id', 'tank', 'sensor', 'event', 'temperature', 'valve_state', 'timestamp', 'message']
@@ -0,0 +1,181 @@
+"""
+Thermal plant simulator for closed-loop testing. ThermalPlant models the
+temperature of many tanks at once with NumPy arrays; SimulatedEvokClient
+exposes it through the EvokClient interface, so the controllers run against
+it unchanged (see api.evok_client.set_client and scripts/simulate_plant.py).
+"""
+import time
+
+import numpy as np
+
+from api.evok_client import EvokSnapshot, SensorReading
+
+# Plant defaults (SI units, temperatures in °C)
+HEAT_CAPACITY = 4186.0  # J/(kg·K), close enough for wort and beer
+DEFAULT_VOLUME = 1000.0  # litres, taken as kg
+DEFAULT_AMBIENT = 20.0
+DEFAULT_GLYCOL = -2.0
+DEFAULT_AMBIENT_UA = 15.0  # W/K through the tank wall
+DEFAULT_JACKET_UA = 250.0  # W/K through the cooling jacket while glycol flows
+DEFAULT_PEAK_HEAT = 200.0  # W of fermentation heat at high krausen
+DEFAULT_PEAK_TIME = 48 * 3600.0  # seconds after pitching
+DEFAULT_PEAK_WIDTH = 24 * 3600.0  # seconds
+SENSOR_RESOLUTION = 0.0625  # DS18B20 12-bit steps
+
+
+def _per_tank(value, count):
+    return np.broadcast_to(np.asarray(value, dtype=float), (count,)).copy()
+
+
+class ThermalPlant:
+    """
+    Lumped thermal model of `count` tanks. Each tank gains fermentation heat
+    (a bell curve around peak_time), exchanges heat with the ambient air and,
+    while its valve is open, loses heat to the glycol jacket. Every parameter
+    is a scalar or a per-tank array.
+    """
+
+    def __init__(self, count, initial=DEFAULT_AMBIENT, volume=DEFAULT_VOLUME, ambient=DEFAULT_AMBIENT,
+                 glycol=DEFAULT_GLYCOL, ambient_ua=DEFAULT_AMBIENT_UA, jacket_ua=DEFAULT_JACKET_UA,
+                 peak_heat=DEFAULT_PEAK_HEAT, peak_time=DEFAULT_PEAK_TIME, peak_width=DEFAULT_PEAK_WIDTH,
+                 noise=0.0, seed=None):
+        self.count = count
+        self.temperature = _per_tank(initial, count)
+        self.capacity = _per_tank(volume, count) * HEAT_CAPACITY
+        self.ambient = _per_tank(ambient, count)
+        self.glycol = _per_tank(glycol, count)
+        self.ambient_ua = _per_tank(ambient_ua, count)
+        self.jacket_ua = _per_tank(jacket_ua, count)
+        self.peak_heat = _per_tank(peak_heat, count)
+        self.peak_time = _per_tank(peak_time, count)
+        self.peak_width = _per_tank(peak_width, count)
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.valve_open = np.zeros(count, dtype=bool)
+        self.valve_switches = np.zeros(count, dtype=np.int64)
+        self.time = 0.0
+
+    def fermentation_heat(self):
+        """Returns the fermentation heat output of every tank (W) at the current time."""
+        return self.peak_heat * np.exp(-0.5 * ((self.time - self.peak_time) / self.peak_width) ** 2)
+
+    def set_valve(self, index, is_open):
+        """Opens or closes one tank's glycol valve, counting actual switches."""
+        if self.valve_open[index] != is_open:
+            self.valve_open[index] = is_open
+            self.valve_switches[index] += 1
+
+    def step(self, dt):
+        """
+        Advances every tank by dt seconds. Inputs are held constant over the
+        step and the linear model is integrated exactly, so large steps stay
+        stable.
+        """
+        jacket_ua = self.jacket_ua * self.valve_open
+        conductance = self.ambient_ua + jacket_ua
+        equilibrium = (self.fermentation_heat() + self.ambient_ua * self.ambient + jacket_ua * self.glycol) / conductance
+        decay = np.exp(-conductance * dt / self.capacity)
+        self.temperature = equilibrium + (self.temperature - equilibrium) * decay
+        self.time += dt
+
+    def measure(self):
+        """Returns sensor readings: temperatures plus noise, quantized like a DS18B20."""
+        values = self.temperature
+        if self.noise:
+            values = values + self.rng.normal(0.0, self.noise, self.count)
+        return np.round(values / SENSOR_RESOLUTION) * SENSOR_RESOLUTION
+
+
+class SimulatedEvokClient:
+    """
+    Stand-in for EvokClient backed by a ThermalPlant. Sensor circuits read the
+    tank temperatures, writes to valve circuits open and close the plant's
+    valves, and any other inputs and relays are kept in plain dicts.
+    """
+
+    base_url = "sim://plant"
+
+    def __init__(self, plant, sensor_circuits, valve_circuits, inputs=None, relays=None):
+        """
+        :param plant: The ThermalPlant to drive.
+        :param sensor_circuits: Sensor circuit of every tank, in plant order.
+        :param valve_circuits: Valve relay circuit of every tank, in plant order.
+        :param inputs: Digital input circuit -> value.
+        :param relays: Other relay circuit -> value.
+        """
+        self.plant = plant
+        self.sensor_circuits = list(sensor_circuits)
+        self.valve_circuits = list(valve_circuits)
+        self.sensor_index = {circuit: i for i, circuit in enumerate(self.sensor_circuits)}
+        self.valve_index = {circuit: i for i, circuit in enumerate(self.valve_circuits)}
+        self.inputs = dict(inputs or {})
+        self.relays = dict(relays or {})
+        self.reads = 0
+        self.writes = 0
+
+    def get_snapshot(self):
+        self.reads += 1
+        values = self.plant.measure().tolist()
+        valves = self.plant.valve_open.tolist()
+        devices = [{"dev": "data_point", "circuit": c, "value": v, "valid": True}
+                   for c, v in zip(self.sensor_circuits, values)]
+        devices += [{"dev": "relay", "circuit": c, "value": int(v)} for c, v in zip(self.valve_circuits, valves)]
+        devices += [{"dev": "input", "circuit": c, "value": v} for c, v in self.inputs.items()]
+        devices += [{"dev": "relay", "circuit": c, "value": v} for c, v in self.relays.items()]
+        return EvokSnapshot(devices)
+
+    def read_devices(self, devices, deadline=None):
+        snapshot = self.get_snapshot()
+        return EvokSnapshot(
+            dict(snapshot.get(dev, circuit), dev=dev, circuit=circuit)
+            for dev, circuit in devices
+            if snapshot.get(dev, circuit) is not None
+        )
+
+    def read_state(self, devices, deadline=None):
+        return self.get_snapshot()
+
+    def get_sensor_reading(self, circuit):
+        self.reads += 1
+        index = self.sensor_index.get(circuit)
+        if index is None:
+            return SensorReading(None, False, time.time())
+        return SensorReading(float(self.plant.measure()[index]), True, time.time())
+
+    def get_sensor_status(self, circuit):
+        return self.get_sensor_reading(circuit).valid
+
+    def get_temperature(self, circuit):
+        return self.get_sensor_reading(circuit).value
+
+    def get_digital_input_state(self, circuit):
+        self.reads += 1
+        return self.inputs.get(circuit)
+
+    def get_relay_state(self, circuit):
+        self.reads += 1
+        if circuit in self.valve_index:
+            return int(self.plant.valve_open[self.valve_index[circuit]])
+        return self.relays.get(circuit)
+
+    def set_relay(self, circuit, value):
+        self.writes += 1
+        if circuit in self.valve_index:
+            self.plant.set_valve(self.valve_index[circuit], bool(value))
+        elif circuit in self.relays:
+            self.relays[circuit] = int(value)
+        else:
+            return False
+        return True
+
+    def set_relays(self, values):
+        return {circuit: self.set_relay(circuit, value) for circuit, value in values.items()}
+
+    def write_outputs(self, values):
+        return self.set_relays(values)
+
+    def get_stats(self):
+        return {"simulator": {"reads": self.reads, "writes": self.writes}}
+
+    def close(self):
+        pass
@@ -0,0 +1,16 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from api.views import DigitalInputViewSet, LogViewSet, RelayViewSet, SensorViewSet, TankViewSet, ValveViewSet
+
+router = DefaultRouter()
+router.register('tanks', TankViewSet)
+router.register('sensors', SensorViewSet)
+router.register('valves', ValveViewSet)
+router.register('digital-inputs', DigitalInputViewSet)
+router.register('relays', RelayViewSet)
+router.register('logs', LogViewSet, basename='log')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -1,3 +1,78 @@
-from django.shortcuts import render
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
+from rest_framework import viewsets
+from rest_framework.renderers import JSONRenderer
 
-# Create your views here.
+from api.serializers import (
+    DigitalInputSerializer,
+    LogSerializer,
+    RelaySerializer,
+    SensorSerializer,
+    TankSerializer,
+    ValveSerializer,
+)
+from core.models import DigitalInput, Log, Relay, Sensor, Tank, Valve
+from core.registry import state_version
+
+DEFAULT_LOG_LIMIT = 50
+MAX_LOG_LIMIT = 500
+
+
+def state_etag(request, *args, **kwargs):
+    """ETag for every status endpoint: the global state version (no query)."""
+    return state_version()
+
+
+@method_decorator(gzip_page, name='dispatch')
+@method_decorator(condition(etag_func=state_etag), name='dispatch')
+class StatusViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only status endpoint. Conditional GETs whose If-None-Match matches the
+    current state version get a 304 before DRF runs, so unchanged polls cost
+    no query and no serialization. Responses are gzipped when the client
+    accepts it.
+    """
+    renderer_classes = [JSONRenderer]
+
+
+class TankViewSet(StatusViewSet):
+    queryset = Tank.objects.select_related('sensor').order_by('id')
+    serializer_class = TankSerializer
+
+
+class SensorViewSet(StatusViewSet):
+    queryset = Sensor.objects.order_by('id')
+    serializer_class = SensorSerializer
+
+
+class ValveViewSet(StatusViewSet):
+    queryset = Valve.objects.order_by('id')
+    serializer_class = ValveSerializer
+
+
+class DigitalInputViewSet(StatusViewSet):
+    queryset = DigitalInput.objects.order_by('id')
+    serializer_class = DigitalInputSerializer
+
+
+class RelayViewSet(StatusViewSet):
+    queryset = Relay.objects.order_by('id')
+    serializer_class = RelaySerializer
+
+
+class LogViewSet(StatusViewSet):
+    """
+    Most recent log entries, newest first. ?limit= sets how many (default 50, max 500).
+    """
+    serializer_class = LogSerializer
+
+    def get_queryset(self):
+        queryset = Log.objects.order_by('-timestamp', '-id')
+        if self.action != 'list':
+            return queryset
+        try:
+            limit = int(self.request.query_params.get('limit', DEFAULT_LOG_LIMIT))
+        except ValueError:
+            limit = DEFAULT_LOG_LIMIT
+        return queryset[:max(1, min(limit, MAX_LOG_LIMIT))]
@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import Tank, Sensor, Valve, Log
+from .models import Tank, Sensor, Valve, Log, AlarmState, EvokUnit
 
 admin.site.register(Tank)
 admin.site.register(Sensor)
 admin.site.register(Valve)
-admin.site.register(Log)
\ No newline at end of file
+admin.site.register(Log)
+admin.site.register(AlarmState)
+admin.site.register(EvokUnit)
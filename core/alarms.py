@@ -0,0 +1,169 @@
+"""
+Alarm engine. Alarms are declared as rules (ALARM_RULES); each rule checks one
+condition per device against the current tick's snapshot. A condition that
+holds for longer than the rule's delay raises an alarm, and the alarm clears
+as soon as the condition is gone. Only those two transitions are logged.
+
+The state of every condition is kept in AlarmState rows, loaded once and
+written only when it changes, so pending delays survive a restart.
+"""
+from abc import ABC, abstractmethod
+
+from django.utils import timezone
+
+from core.config import ALARM_SENSOR_INVALID_DELAY, ALARM_TEMPERATURE_DELAY
+from core.log_sink import log_sink
+from core.models import AlarmState
+from core.utils import persist_dirty
+
+
+class AlarmRule(ABC):
+    """
+    Base class for alarm rules. Subclasses must implement conditions().
+    :param name: Rule name, the first part of every AlarmState key.
+    :param delay: Seconds the condition must hold before the alarm is raised.
+    :param sounds_alarm: Raised alarms switch on the alarm relay.
+    """
+
+    def __init__(self, name, delay=0.0, sounds_alarm=True):
+        self.name = name
+        self.delay = delay
+        self.sounds_alarm = sounds_alarm
+
+    @abstractmethod
+    def conditions(self, registry, source):
+        """
+        Yields (device id, condition, message, log fields) for every device the
+        rule covers. condition is None when the tick has no data for the device,
+        which leaves its state unchanged.
+        """
+
+
+class SensorInvalidRule(AlarmRule):
+    """Sensor reads are invalid or missing."""
+
+    def conditions(self, registry, source):
+        for sensor in registry.sensors:
+            reading = source.get_sensor_reading(sensor.address)
+            yield (
+                sensor.id,
+                not reading.valid,
+                f"Sensor '{sensor.name}' has been in error state for over {self.delay:g} seconds.",
+                {"sensor_id": sensor.id},
+            )
+
+
+class TemperatureRangeRule(AlarmRule):
+    """Temperature is outside the sensor's min_temp/max_temp."""
+
+    def conditions(self, registry, source):
+        for sensor in registry.sensors:
+            reading = source.get_sensor_reading(sensor.address)
+            if not reading.valid or reading.value is None:
+                yield sensor.id, None, "", {}
+                continue
+            yield (
+                sensor.id,
+                not sensor.min_temp <= reading.value <= sensor.max_temp,
+                f"Sensor '{sensor.name}' reads {reading.value} °C, outside "
+                f"{sensor.min_temp}-{sensor.max_temp} °C.",
+                {"sensor_id": sensor.id, "temperature": reading.value},
+            )
+
+
+class DigitalInputRule(AlarmRule):
+    """
+    A digital input is in the given state.
+    :param input_name: Name of the DigitalInput.
+    :param message: Logged when the alarm is raised.
+    :param state: Input state that counts as the alarm condition.
+    """
+
+    def __init__(self, name, input_name, message, state=True, **kwargs):
+        super().__init__(name, **kwargs)
+        self.input_name = input_name
+        self.message = message
+        self.state = state
+
+    def conditions(self, registry, source):
+        for digital_input in registry.digital_inputs:
+            if digital_input.name != self.input_name:
+                continue
+            value = source.get_digital_input_state(digital_input.address)
+            condition = None if value is None else bool(value) == self.state
+            yield digital_input.id, condition, self.message, {}
+
+
+ALARM_RULES = (
+    SensorInvalidRule("sensor_invalid", delay=ALARM_SENSOR_INVALID_DELAY),
+    TemperatureRangeRule("temperature_range", delay=ALARM_TEMPERATURE_DELAY),
+    # Recorded for the log only; the total stop handling switches every relay off
+    DigitalInputRule("total_stop", "Total_Stop_DI", "Total stop is active.", sounds_alarm=False),
+)
+
+
+class AlarmEngine:
+    def __init__(self, rules=ALARM_RULES):
+        self.rules = rules
+        self._states = None
+        self.transitions = 0
+
+    def _load(self):
+        if self._states is None:
+            self._states = {state.key: state for state in AlarmState.objects.all()}
+        return self._states
+
+    def invalidate(self):
+        """Reloads the states from the database on the next evaluation."""
+        self._states = None
+
+    def evaluate(self, registry, source, now=None):
+        """
+        Applies every rule to one tick's readings.
+        :param registry: DeviceRegistry with the configured devices.
+        :param source: EvokSnapshot (or client) with this tick's device state.
+        :param now: Evaluation time, defaults to timezone.now().
+        :return: The active AlarmStates whose rules sound the alarm.
+        """
+        now = now or timezone.now()
+        states = self._load()
+        sounding = []
+        for rule in self.rules:
+            for device_id, condition, message, log_fields in rule.conditions(registry, source):
+                key = f"{rule.name}:{device_id}"
+                state = states.get(key)
+                if condition is None:
+                    pass
+                elif condition:
+                    if state is None:
+                        state = states[key] = AlarmState.objects.create(key=key, condition_since=now)
+                    elif state.condition_since is None:
+                        state.condition_since = now
+                    if not state.active and (now - state.condition_since).total_seconds() >= rule.delay:
+                        self._raise(state, now, message, log_fields)
+                elif state is not None and state.condition_since is not None:
+                    if state.active:
+                        self._clear(state, now, log_fields)
+                    state.condition_since = None
+                if state is not None and state.active and rule.sounds_alarm:
+                    sounding.append(state)
+
+        persist_dirty(states.values())
+        return sounding
+
+    def _raise(self, state, now, message, log_fields):
+        state.active = True
+        state.raised_at = now
+        state.message = message
+        self.transitions += 1
+        log_sink.add(event=f"Alarm raised: {state.key}", message=message, **log_fields)
+
+    def _clear(self, state, now, log_fields):
+        state.active = False
+        state.cleared_at = now
+        self.transitions += 1
+        log_sink.add(event=f"Alarm cleared: {state.key}", message=f"Cleared: {state.message}", **log_fields)
+
+
+# Shared by all controllers in the process
+alarm_engine = AlarmEngine()
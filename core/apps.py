@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core.db import configure_sqlite
+        from core.models import DigitalInput, EvokUnit, Log, Relay, Sensor, Tank, Valve
+        from core.registry import bump_state_version, invalidate_on_change
+
+        connection_created.connect(configure_sqlite, dispatch_uid="core_configure_sqlite")
+
+        # Configuration changes from any process make every DeviceRegistry reload
+        for model in (EvokUnit, Tank, Sensor, Valve, DigitalInput, Relay):
+            post_save.connect(invalidate_on_change, sender=model, dispatch_uid=f"registry_{model.__name__}_save")
+            post_delete.connect(invalidate_on_change, sender=model, dispatch_uid=f"registry_{model.__name__}_delete")
+        # Log rows written outside the buffered sink (e.g. from the dashboard)
+        post_save.connect(bump_state_version, sender=Log, dispatch_uid="state_version_log_save")
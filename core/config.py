@@ -0,0 +1,60 @@
+"""
+Controller tuning constants.
+"""
+
+# How the controller learns the device state: "websocket" keeps a state table
+# from EVOK's push events and polls only while the socket is down, "poll" always
+# polls.
+EVOK_INPUT_MODE = "websocket"
+
+# Hard limit for reading every device in one cycle (seconds). Devices that have
+# not answered by then are treated as "no data" for that cycle. Keep it above
+# api.evok_client.EVOK_CONNECT_TIMEOUT, so an unreachable unit fails its connect
+# before the deadline cancels the read.
+CYCLE_DEADLINE = 0.5
+
+# Buffered Log writes: flush when this many rows are waiting or the oldest row
+# has waited this long (seconds).
+LOG_FLUSH_SIZE = 500
+LOG_FLUSH_INTERVAL = 5.0
+
+# Seconds between re-reading the real relay states to catch outputs that
+# drifted from what the controller last wrote.
+OUTPUT_RESYNC_INTERVAL = 60.0
+
+# Scheduler periods (seconds). Each task runs at a fixed rate. The emergency
+# stop is not a task: the safety interlock polls it from its own thread.
+TASK_PERIODS = {
+    "inputs": 0.5,
+    "sensors": 1.0,
+    "regulation": 2.0,
+    "alarms": 5.0,
+    "flush": 1.0,
+    "publish": 0.5,
+    "safety_reset": 0.5,
+    "report": 60.0,
+}
+
+# Tasks running within this many seconds of each other share one device snapshot.
+# The age counts from the start of the read. Keep it well below the shortest
+# task period ("inputs"), so every inputs run gets a fresh read.
+SNAPSHOT_MAX_AGE = 0.25
+
+# Seconds an alarm condition must hold before the alarm is raised (core.alarms)
+ALARM_SENSOR_INVALID_DELAY = 60.0
+ALARM_TEMPERATURE_DELAY = 30.0
+
+# Prometheus metrics endpoint served by the controller process (core.metrics).
+# Set METRICS_PORT to None to disable it.
+METRICS_HOST = "0.0.0.0"
+METRICS_PORT = 9108
+
+# Safety interlock (api.safety). The inputs are polled from a dedicated thread
+# with its own EVOK client; its timeouts bound every poll and the off-write.
+SAFETY_INPUTS = ("Total_Stop_DI",)
+SAFETY_POLL_PERIOD = 0.02
+SAFETY_TIMEOUT = 0.1
+# Trips slower than this (input seen to outputs off, seconds) are reported
+SAFETY_REACTION_BUDGET = 0.25
+# Trip after this many consecutive polls without an answer; None never does
+SAFETY_MAX_MISSED_POLLS = None
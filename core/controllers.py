@@ -1,114 +1,141 @@
-from datetime import timedelta
-from api.evok_client import EvokClient
-from core.models import Sensor, Valve, Tank, Log, DigitalInput, Relay
-from django.utils import timezone
+import time
+from api.evok_client import get_client
+from core.alarms import alarm_engine
+from core.config import CYCLE_DEADLINE, SNAPSHOT_MAX_AGE
+from core.log_sink import log_sink, reading_sink
+from core.metrics import SNAPSHOT_DURATION
+from core.models import Valve, DigitalInput, Relay
+from core.outputs import outputs
+from core.registry import registry
 
-sensor_error_times = {}
+_latest_snapshot = None
+_latest_snapshot_started = None
 
 
-def update_sensors():
+def take_snapshot(client=None, deadline=CYCLE_DEADLINE):
+    """
+    Reads the state of every configured device for one cycle, from all EVOK
+    units at once. Each unit is read from the client's WebSocket state table
+    while it is subscribed, otherwise with EVOK's single "all devices" request,
+    falling back to reading each sensor, digital input, relay and valve
+    concurrently. A unit that has not answered by the cycle deadline only
+    loses its own devices.
+    :return: An EvokSnapshot; devices that did not answer in time are missing from it.
+    """
+    client = client or get_client()
+    devices = [("data_point", sensor.address) for sensor in registry.sensors]
+    devices += [("di", di.address) for di in registry.digital_inputs]
+    devices += [("ro", relay.address) for relay in registry.relays]
+    devices += [("ro", valve.address) for valve in registry.valves]
+    with SNAPSHOT_DURATION.time():
+        return client.read_state(devices, deadline)
+
+
+def latest_snapshot(max_age=SNAPSHOT_MAX_AGE):
+    """
+    Returns the most recent snapshot if its read started less than max_age
+    seconds ago, otherwise takes a new one. Lets tasks that run close together
+    share one read.
+    """
+    global _latest_snapshot, _latest_snapshot_started
+    # Timed from the start of the read: taken_at is stamped when it finished
+    now = time.monotonic()
+    if _latest_snapshot is None or now - _latest_snapshot_started > max_age:
+        _latest_snapshot = take_snapshot()
+        _latest_snapshot_started = now
+    return _latest_snapshot
+
+
+def _device_source(client, snapshot):
+    """
+    Returns the snapshot controllers read device state from, taking a new one
+    if the caller did not pass the cycle snapshot in.
+    """
+    return snapshot if snapshot is not None else take_snapshot(client)
+
+
+def update_sensors(snapshot=None):
     """
     Updates the temperature readings for all sensors associated with xG18.
     Logs any errors or updates in the process.
+    :param snapshot: Optional EvokSnapshot shared by the whole cycle.
     """
-    client = EvokClient()
-    sensors = Sensor.objects.all()
-    for sensor in sensors:
-        temperature = client.get_temperature(sensor.circuit)
+    source = _device_source(get_client(), snapshot)
+    for sensor in registry.sensors:
+        reading = source.get_sensor_reading(sensor.address)
+        # Every sensor, regulated or not, so a recovered sensor clears its error
+        sensor.update_error_state(reading=reading, commit=False)
+        temperature = reading.value
         if temperature is not None:
             sensor.current_temperature = temperature
-            sensor.last_updated = timezone.now()
-            sensor.save()
-            Log.objects.create(
-                sensor=sensor,
-                message=f"Sensor '{sensor.name}' temperature updated to {temperature:.2f} °C."
-            )
+            # Samples go to the history database, the Log table only keeps events
+            reading_sink.add(sensor_id=sensor.id, ts=reading.timestamp, value=temperature, valid=reading.valid)
             print(f"Updated sensor '{sensor.name}' with temperature {temperature} °C.")
         else:
-            sensor.error_active = True
-            sensor.save()
-            Log.objects.create(
+            log_sink.add(
                 sensor=sensor,
                 message=f"Failed to read temperature for sensor '{sensor.name}'."
             )
             print(f"Failed to update sensor '{sensor.name}'.")
 
+    registry.persist()
 
-def check_and_trigger_alarm():
-    """
-    Checks alarm conditions and activates the alarm relay if necessary.
-    Handles sensor faults using the 'valid' parameter.
-    """
-    client = EvokClient()
-    alarm_triggered = False
-    alarm_message = ""
-
-    sensors = Sensor.objects.all()
-    now = timezone.now()
-    for sensor in sensors:
-        sensor.update_error_state()
-
-        if sensor.error_active:
-            if sensor.circuit not in sensor_error_times:
-                sensor_error_times[sensor.circuit] = now
-            else:
-                elapsed = now - sensor_error_times[sensor.circuit]
-                if elapsed > timedelta(seconds=60):
-                    alarm_triggered = True
-                    alarm_message += f"Sensor '{sensor.name}' is faulty for over 60 seconds. "
-                    Log.objects.create(
-                        tank=None,
-                        event=f"Alarm triggered for sensor '{sensor.name}'.",
-                        message=f"Sensor '{sensor.name}' has been in error state for over 60 seconds.",
-                    )
-        else:
-            if sensor.circuit in sensor_error_times:
-                del sensor_error_times[sensor.circuit]
 
-    alarm_relay = Relay.objects.get(name="Alarm_Relay")
-    if alarm_triggered:
-        client.set_relay(alarm_relay.circuit, 1)
-        alarm_relay.is_active = True
-        Log.objects.create(message="Alarm triggered: " + alarm_message)
-    else:
-        client.set_relay(alarm_relay.circuit, 0)
-        alarm_relay.is_active = False
-        Log.objects.create(message="Alarm cleared.")
+def _set_relay_state(relay, active):
+    """
+    Requests a relay state from the output reconciler and records it on the Relay.
+    The row is written by registry.persist() only if the state changed. While
+    the safety interlock holds the outputs off, the relay is recorded as off.
+    """
+    active = bool(active)
+    outputs.set(relay.address, active)
+    relay.is_active = active and not outputs.inhibited()
+
 
-    alarm_relay.save()
+def check_and_trigger_alarm(snapshot=None):
+    """
+    Evaluates the alarm rules (core.alarms) on this cycle's readings and switches
+    the alarm relay on while any sounding alarm is active. Only alarm raise and
+    clear transitions are logged.
+    :param snapshot: Optional EvokSnapshot shared by the whole cycle.
+    :return: The active AlarmStates that sound the alarm.
+    """
+    source = _device_source(get_client(), snapshot)
+    sounding = alarm_engine.evaluate(registry, source)
+
+    alarm_relay = registry.get(Relay, name="Alarm_Relay")
+    _set_relay_state(alarm_relay, bool(sounding))
+    outputs.commit(source)
+    registry.persist()
+    return sounding
 
 
-def regulate_temperature():
+def regulate_temperature(snapshot=None):
     """
     Automatically regulates the temperature of each tank.
+    :param snapshot: Optional EvokSnapshot shared by the whole cycle.
     """
-    client = EvokClient()
-    tanks = Tank.objects.select_related('sensor', 'valve').all()
-
-    for tank in tanks:
+    source = _device_source(get_client(), snapshot)
+    for tank in registry.tanks:
         if tank.sensor and tank.valve:
-            tank.sensor.update_error_state()
+            # One reading provides both the validity check and the temperature
+            reading = source.get_sensor_reading(tank.sensor.address)
+            tank.sensor.update_error_state(reading=reading, commit=False)
 
             if tank.sensor.error_active:
                 continue
 
-            current_temp = client.get_temperature(tank.sensor.circuit)
+            current_temp = reading.value
             if current_temp is not None:
                 tank.sensor.current_temperature = current_temp
-                tank.sensor.last_updated = timezone.now()
-                tank.sensor.save()
 
-                if current_temp > tank.target_temperature and not tank.valve.is_open:
-                    client.set_relay(tank.valve.circuit, 1)
-                    tank.valve.is_open = True
-                    tank.valve.save()
-                elif current_temp <= tank.target_temperature and tank.valve.is_open:
-                    client.set_relay(tank.valve.circuit, 0)
-                    tank.valve.is_open = False
-                    tank.valve.save()
+                # The reconciler only writes to EVOK if the valve is not already in this state
+                valve_open = current_temp > tank.target_temperature
+                outputs.set(tank.valve.address, valve_open)
+                tank.valve.is_open = valve_open and not outputs.inhibited()
 
-    # Check and trigger alarms for persistent errors
-    check_and_trigger_alarm()
+    outputs.commit(source)
+    registry.persist()
 
 
 def control_valve(valve_name, state):
@@ -117,14 +144,13 @@ def control_valve(valve_name, state):
     :param valve_name: Name of the valve to control.
     :param state: 1 to open, 0 to close.
     """
-    client = EvokClient()
     try:
-        valve = Valve.objects.get(name=valve_name)
-        success = client.set_relay(valve.circuit, state)
+        valve = registry.get(Valve, name=valve_name)
+        outputs.set(valve.address, state)
+        success = outputs.commit().get(valve.address, True)
         if success:
             valve.is_open = bool(state)
-            valve.last_updated = timezone.now()
-            valve.save()
+            registry.persist()
             print(f"Valve '{valve.name}' set to {'Open' if state else 'Closed'}.")
         else:
             print(f"Failed to control valve '{valve.name}'.")
@@ -132,49 +158,38 @@ def control_valve(valve_name, state):
         print(f"Error: Valve '{valve_name}' does not exist. Please add it to the database.")
 
 
-def update_inputs_and_relays():
+def update_inputs_and_relays(snapshot=None):
     """
     Updates the state of digital inputs and relays based on the current system status.
+    :param snapshot: Optional EvokSnapshot shared by the whole cycle.
     """
-    client = EvokClient()
+    source = _device_source(get_client(), snapshot)
 
     # Update digital inputs
-    inputs = DigitalInput.objects.all()
-    for di in inputs:
-        state = client.get_digital_input_state(di.circuit)  # Read state from EVOK API
+    for di in registry.digital_inputs:
+        state = source.get_digital_input_state(di.address)  # Read state from EVOK API
         if state is not None:
-            di.state = state
-            di.save()
+            di.state = bool(state)
             print(f"Digital Input '{di.name}' updated to {'Active' if state else 'Inactive'}.")
 
     # Process Total Stop first (highest priority)
-    total_stop = DigitalInput.objects.get(name="Total_Stop_DI")
+    total_stop = registry.get(DigitalInput, name="Total_Stop_DI")
     if total_stop.state:
         print("Total Stop is active. Disabling all relays.")
-        relays = Relay.objects.all()
-        for relay in relays:
-            client.set_relay(relay.circuit, 0)  # Turn off relay
-            relay.is_active = False
-            relay.save()
+        for relay in registry.relays:
+            _set_relay_state(relay, False)  # Turn off relay
+        outputs.commit(source)
+        registry.persist()
         return  # Skip other processing when total stop is active
 
     # Update relays based on inputs
-    pump_di = DigitalInput.objects.get(name="Pump_DI")
-    pump_relay = Relay.objects.get(name="Pump_Relay")
-    if pump_di.state:
-        client.set_relay(pump_relay.circuit, 1)  # Turn on relay
-        pump_relay.is_active = True
-    else:
-        client.set_relay(pump_relay.circuit, 0)  # Turn off relay
-        pump_relay.is_active = False
-    pump_relay.save()
-
-    chiller_di = DigitalInput.objects.get(name="Chiller_DI")
-    chiller_relay = Relay.objects.get(name="Chiller_Relay")
-    if chiller_di.state:
-        client.set_relay(chiller_relay.circuit, 1)  # Turn on relay
-        chiller_relay.is_active = True
-    else:
-        client.set_relay(chiller_relay.circuit, 0)  # Turn off relay
-        chiller_relay.is_active = False
-    chiller_relay.save()
+    pump_di = registry.get(DigitalInput, name="Pump_DI")
+    pump_relay = registry.get(Relay, name="Pump_Relay")
+    _set_relay_state(pump_relay, pump_di.state)
+
+    chiller_di = registry.get(DigitalInput, name="Chiller_DI")
+    chiller_relay = registry.get(Relay, name="Chiller_Relay")
+    _set_relay_state(chiller_relay, chiller_di.state)
+
+    outputs.commit(source)
+    registry.persist()
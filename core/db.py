@@ -0,0 +1,30 @@
+"""
+SQLite connection tuning, applied to every new connection through the
+connection_created signal (connected in CoreConfig.ready).
+"""
+
+# WAL lets the dashboard read while the controller writes. synchronous=NORMAL
+# is safe with WAL (a power cut can only lose the last transactions, never
+# corrupt the database). busy_timeout makes a blocked writer wait instead of
+# failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # milliseconds
+    "mmap_size": 64 * 1024 * 1024,  # bytes
+    "cache_size": -16000,  # negative means KiB, so about 16 MB per connection
+    "temp_store": "MEMORY",
+}
+
+
+def apply_pragmas(cursor, pragmas=SQLITE_PRAGMAS):
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created handler that applies SQLITE_PRAGMAS to SQLite connections."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor)
@@ -0,0 +1,84 @@
+"""
+Publishes the controller's current device state for the dashboard. The state
+is a flat {key: value} map written atomically to LIVE_STATE_FILE whenever it
+changes; the web process picks it up from there (see dashboard.live), so live
+viewers never cause a database query.
+"""
+import json
+import os
+
+from django.conf import settings
+
+from core.registry import registry
+from core.safety import is_latched
+
+LIVE_STATE_FILE = settings.LIVE_STATE_FILE
+
+# Temperatures are published with this precision so sensor noise below it does
+# not produce an update.
+TEMPERATURE_DECIMALS = 1
+
+
+def build_state(registry):
+    """
+    Builds the live state from the registry's cached objects.
+    :return: Dict keyed like "tank:<id>:temperature", "valve:<id>", "relay:<id>",
+        "di:<id>", "sensor:<id>:error", plus "alarm", "total_stop" and "safety_latched".
+    """
+    registry.ensure_loaded()
+    state = {}
+    for tank in registry.tanks:
+        temperature = tank.sensor.current_temperature if tank.sensor else None
+        if temperature is not None:
+            temperature = round(temperature, TEMPERATURE_DECIMALS)
+        state[f"tank:{tank.id}:temperature"] = temperature
+        state[f"tank:{tank.id}:target"] = tank.target_temperature
+    for sensor in registry.sensors:
+        state[f"sensor:{sensor.id}:error"] = sensor.error_active
+    for valve in registry.valves:
+        state[f"valve:{valve.id}"] = valve.is_open
+    for digital_input in registry.digital_inputs:
+        state[f"di:{digital_input.id}"] = bool(digital_input.state)
+        if digital_input.name == "Total_Stop_DI":
+            state["total_stop"] = bool(digital_input.state)
+    for relay in registry.relays:
+        state[f"relay:{relay.id}"] = relay.is_active
+        if relay.name == "Alarm_Relay":
+            state["alarm"] = relay.is_active
+    state["safety_latched"] = is_latched()
+    return state
+
+
+class StatePublisher:
+    """
+    Writes the live state file, but only when the state differs from the last
+    one written.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or LIVE_STATE_FILE
+        self.published = None
+        self.writes = 0
+
+    def publish(self, state):
+        """
+        :return: True if the state changed and was written.
+        """
+        if state == self.published:
+            return False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        # Readers see either the old or the new file, never a partial one
+        os.replace(tmp_path, self.path)
+        self.published = state
+        self.writes += 1
+        return True
+
+
+publisher = StatePublisher()
+
+
+def publish_state():
+    """Publishes the controller state if it changed since the last call."""
+    return publisher.publish(build_state(registry))
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from django.db import router, transaction
+
+from core.config import LOG_FLUSH_INTERVAL, LOG_FLUSH_SIZE
+from core.models import Log, Reading
+from core.registry import bump_state_version
+
+
+class BufferedSink:
+    """
+    Write-behind buffer for rows of one model. Rows are collected in memory and
+    written with a single bulk_create inside one transaction once the buffer
+    reaches max_size rows or its oldest row is older than max_age seconds.
+    on_flush, if given, is called after every flush that wrote rows.
+    """
+
+    def __init__(self, model, max_size=LOG_FLUSH_SIZE, max_age=LOG_FLUSH_INTERVAL, on_flush=None):
+        self.model = model
+        self.on_flush = on_flush
+        self.max_size = max_size
+        self.max_age = max_age
+        self._buffer = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_duration = 0.0
+        self.max_flush_duration = 0.0
+
+    def add(self, **fields):
+        """
+        Queues a row. Accepts the same keyword arguments as model.objects.create.
+        """
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(self.model(**fields))
+        self.flush_if_due()
+
+    @property
+    def depth(self):
+        return len(self._buffer)
+
+    def flush_if_due(self):
+        """Flushes if the size or age threshold has been reached."""
+        with self._lock:
+            due = len(self._buffer) >= self.max_size or (
+                self._buffer and time.monotonic() - self._oldest >= self.max_age
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Writes every queued row in one transaction. Returns the number of rows written."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._oldest = None
+        if not rows:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            with transaction.atomic(using=router.db_for_write(self.model)):
+                self.model.objects.bulk_create(rows)
+        except Exception:
+            # Put the rows back so they are retried with the next flush
+            with self._lock:
+                self._buffer[:0] = rows
+                self._oldest = time.monotonic()
+            raise
+        duration = time.perf_counter() - start
+
+        self.flushes += 1
+        self.rows_written += len(rows)
+        self.last_flush_duration = duration
+        self.max_flush_duration = max(self.max_flush_duration, duration)
+        if self.on_flush is not None:
+            self.on_flush()
+        return len(rows)
+
+    def get_stats(self):
+        """
+        Returns the buffer depth and flush counters (durations in seconds).
+        """
+        return {
+            "depth": self.depth,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "last_flush_duration": self.last_flush_duration,
+            "max_flush_duration": self.max_flush_duration,
+        }
+
+
+# Shared by all controllers in the process
+log_sink = BufferedSink(Log, on_flush=bump_state_version)
+reading_sink = BufferedSink(Reading)
+
+
+def flush_sinks(force=False):
+    """
+    Flushes every sink, or only those past their size/age threshold unless force is set.
+    :return: The number of rows written.
+    """
+    written = 0
+    for sink in (log_sink, reading_sink):
+        if force:
+            written += sink.flush()
+        else:
+            before = sink.rows_written
+            sink.flush_if_due()
+            written += sink.rows_written - before
+    return written
@@ -0,0 +1,61 @@
+import gzip
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Log
+
+ARCHIVE_FIELDS = ('id', 'tank_id', 'sensor_id', 'event', 'temperature', 'valve_state', 'timestamp', 'message')
+
+
+class Command(BaseCommand):
+    help = "Moves Log rows older than N days into a gzipped JSON Lines archive under data/ and deletes them in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Keep rows newer than this many days.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows archived and deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help="Seconds to wait between batches so the controller can write.")
+        parser.add_argument('--archive-dir', type=Path, default=settings.BASE_DIR / 'data' / 'archive',
+                            help="Directory for the archive files.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        archive_dir = options['archive_dir']
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        path = archive_dir / f"logs-before-{cutoff:%Y%m%d}-{int(time.time())}.jsonl.gz"
+
+        self.stdout.write(f"Archiving logs older than {cutoff:%Y-%m-%d %H:%M} to {path}...")
+        archived = 0
+        with gzip.open(path, 'wt', encoding='utf-8') as archive:
+            while True:
+                rows = list(
+                    Log.objects.filter(timestamp__lt=cutoff)
+                    .order_by('id')
+                    .values(*ARCHIVE_FIELDS)[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                for row in rows:
+                    row['timestamp'] = row['timestamp'].isoformat()
+                    archive.write(json.dumps(row) + "\n")
+                # Write the batch out before it leaves the database
+                archive.flush()
+
+                with transaction.atomic():
+                    Log.objects.filter(id__in=[row['id'] for row in rows]).delete()
+                archived += len(rows)
+                self.stdout.write(f"  {archived} rows archived...")
+                time.sleep(options['pause'])
+
+        if not archived:
+            path.unlink()
+            self.stdout.write("No logs to archive.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Archived and deleted {archived} log rows."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from core.scheduler import run_controller
+
+
+class Command(BaseCommand):
+    help = "Runs the fermentation controller tasks on the multi-rate scheduler"
+
+    def handle(self, *args, **options):
+        self.stdout.write("Starting fermentation controller...")
+        run_controller()
+        self.stdout.write("Fermentation controller stopped.")
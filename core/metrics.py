@@ -0,0 +1,220 @@
+"""
+Controller instrumentation, exposed in Prometheus text format from a small
+HTTP thread inside the controller process (start_metrics_server).
+
+Only the per-run timings are recorded on the hot path (a histogram observe per
+task run, a counter bump per query). Everything else - EVOK client counters,
+relay writes, sink depth, scheduler stats and device state - is read from the
+objects that already keep it when Prometheus scrapes, and the scrape reads the
+registry's cached objects only, so it never touches the database.
+"""
+import time
+
+from django.db import connections
+from prometheus_client import REGISTRY, Histogram, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from api.evok_client import get_client
+from core import safety
+from core.config import METRICS_HOST, METRICS_PORT
+from core.log_sink import log_sink, reading_sink
+from core.models import DigitalInput, Relay, Sensor, Valve
+from core.outputs import outputs
+from core.registry import registry
+
+TASK_DURATION = Histogram(
+    "controller_task_duration_seconds",
+    "Run time of each controller task (phase).",
+    ["task"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+TASK_QUERIES = Histogram(
+    "controller_task_queries",
+    "Database queries per run of each controller task.",
+    ["task"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+SNAPSHOT_DURATION = Histogram(
+    "controller_snapshot_duration_seconds",
+    "Time to read the state of every device from EVOK.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+# Queries run by this process, per database alias
+_query_counts = {}
+
+
+def _count_query(execute, sql, params, many, context):
+    alias = context["connection"].alias
+    _query_counts[alias] = _query_counts.get(alias, 0) + 1
+    return execute(sql, params, many, context)
+
+
+def count_queries():
+    """Starts counting the queries run on the calling thread's connections."""
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if _count_query not in wrappers:
+            wrappers.append(_count_query)
+
+
+def query_count():
+    return sum(_query_counts.values())
+
+
+def instrument(name, func):
+    """
+    Wraps a task so every run records its duration and query count under the
+    task's name.
+    """
+    duration = TASK_DURATION.labels(name)
+    queries = TASK_QUERIES.labels(name)
+
+    def run():
+        queries_before = query_count()
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            duration.observe(time.perf_counter() - start)
+            queries.observe(query_count() - queries_before)
+
+    return run
+
+
+def _family(kind, name, documentation, labels, samples):
+    family = kind(name, documentation, labels=labels)
+    for label_values, value in samples:
+        family.add_metric(label_values, value)
+    return family
+
+
+class ControllerCollector:
+    """
+    Collects the controller's counters and device state at scrape time.
+    :param scheduler: The running Scheduler, for per-task run statistics.
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+
+    def collect(self):
+        yield from self._evok()
+        yield from self._outputs()
+        yield from self._sinks()
+        yield from self._safety()
+        yield from self._tasks()
+        yield _family(CounterMetricFamily, "controller_db_queries", "Database queries run by the controller.",
+                      ["database"], [([alias], count) for alias, count in sorted(_query_counts.items())])
+        yield from self._devices()
+
+    def _evok(self):
+        client = get_client()
+        stats = sorted(client.get_stats().items())
+        for key, name, documentation in (
+            ("requests", "evok_requests", "Requests sent to EVOK."),
+            ("failures", "evok_request_failures", "EVOK requests that failed after retries."),
+            ("retries", "evok_request_retries", "EVOK request retries."),
+        ):
+            yield _family(CounterMetricFamily, name, documentation, ["endpoint"],
+                          [([endpoint], values.get(key, 0)) for endpoint, values in stats])
+        yield _family(GaugeMetricFamily, "evok_request_max_latency_seconds", "Slowest EVOK request so far.",
+                      ["endpoint"], [([endpoint], values.get("max_latency", 0.0)) for endpoint, values in stats])
+        subscription = getattr(client, "subscription", None)
+        if subscription is not None:
+            websocket = subscription.get_stats()
+            yield GaugeMetricFamily("evok_websocket_ready", "1 while device state comes from EVOK's WebSocket.",
+                                    value=int(websocket["ready"]))
+            yield CounterMetricFamily("evok_websocket_events", "Device events received over the WebSocket.",
+                                      value=websocket["events"])
+            yield CounterMetricFamily("evok_websocket_drops", "Times the WebSocket dropped.", value=websocket["drops"])
+        if hasattr(client, "get_unit_health"):
+            health = sorted(client.get_unit_health().items())
+            yield _family(GaugeMetricFamily, "evok_unit_up", "1 while the unit's circuit breaker is closed.", ["unit"],
+                          [([unit], int(values["state"] == "closed")) for unit, values in health])
+            yield _family(GaugeMetricFamily, "evok_unit_consecutive_failures",
+                          "Transport failures in a row on the unit.", ["unit"],
+                          [([unit], values["failures"]) for unit, values in health])
+        breaker = getattr(client, "breaker", None)
+        if breaker is not None:
+            yield GaugeMetricFamily("evok_circuit_breaker_open", "1 while the EVOK circuit breaker is open.",
+                                    value=int(breaker.state != breaker.CLOSED))
+
+    def _outputs(self):
+        yield CounterMetricFamily("controller_relay_writes", "Relay writes sent to EVOK.", value=outputs.writes)
+        yield CounterMetricFamily("controller_relay_write_batches", "Commits that wrote outputs, one bulk request each.",
+                                  value=outputs.batches)
+        yield CounterMetricFamily("controller_relay_write_failures", "Relay writes that failed.",
+                                  value=outputs.write_failures)
+        yield CounterMetricFamily("controller_relay_writes_suppressed",
+                                  "Relay writes skipped because the output already had the value.",
+                                  value=outputs.suppressed)
+
+    def _sinks(self):
+        sinks = (("log", log_sink), ("reading", reading_sink))
+        yield _family(CounterMetricFamily, "controller_sink_rows_written", "Rows written by the buffered sinks.",
+                      ["sink"], [([name], sink.rows_written) for name, sink in sinks])
+        yield _family(GaugeMetricFamily, "controller_sink_depth", "Rows waiting in the buffered sinks.",
+                      ["sink"], [([name], sink.depth) for name, sink in sinks])
+
+    def _safety(self):
+        if safety.interlock is None:
+            return
+        stats = safety.interlock.get_stats()
+        yield GaugeMetricFamily("safety_interlock_tripped", "1 while the safety interlock is latched.",
+                                value=int(stats["tripped"]))
+        yield CounterMetricFamily("safety_interlock_trips", "Safety interlock trips.", value=stats["trips"])
+        yield CounterMetricFamily("safety_interlock_polls", "Polls of the safety inputs.", value=stats["polls"])
+        yield CounterMetricFamily("safety_interlock_lost_polls", "Polls some safety input did not answer.",
+                                  value=stats["lost_polls"])
+        yield GaugeMetricFamily("safety_interlock_max_poll_seconds", "Slowest poll of the safety inputs.",
+                                value=stats["max_poll"])
+        yield GaugeMetricFamily("safety_interlock_max_reaction_seconds",
+                                "Slowest trip, from the poll that saw the input to the outputs off.",
+                                value=stats["max_reaction"])
+        yield GaugeMetricFamily("safety_interlock_worst_case_reaction_seconds",
+                                "Poll period plus the slowest reaction: the bound on reaction time.",
+                                value=stats["worst_case_reaction"])
+
+    def _tasks(self):
+        if self.scheduler is None:
+            return
+        stats = sorted(self.scheduler.get_stats().items())
+        for key, name, documentation in (
+            ("runs", "controller_task_runs", "Runs of each controller task."),
+            ("overruns", "controller_task_overruns", "Runs that took longer than the task period."),
+            ("skipped", "controller_task_skipped_ticks", "Ticks skipped after overruns."),
+            ("errors", "controller_task_errors", "Runs that raised an exception."),
+        ):
+            yield _family(CounterMetricFamily, name, documentation, ["task"],
+                          [([task], values[key]) for task, values in stats])
+        yield _family(GaugeMetricFamily, "controller_task_max_lateness_seconds", "Latest start after the scheduled time.",
+                      ["task"], [([task], values["max_lateness"]) for task, values in stats])
+
+    def _devices(self):
+        tanks = list(registry.tanks)
+        yield _family(GaugeMetricFamily, "tank_temperature_celsius", "Current tank temperature.", ["tank"],
+                      [([tank.name], tank.sensor.current_temperature) for tank in tanks if tank.sensor])
+        yield _family(GaugeMetricFamily, "tank_target_temperature_celsius", "Tank target temperature.", ["tank"],
+                      [([tank.name], tank.target_temperature) for tank in tanks])
+        for model, name, documentation, field in (
+            (Sensor, "sensor_error", "1 while the sensor is in error.", "error_active"),
+            (Valve, "valve_open", "1 while the valve is open.", "is_open"),
+            (Relay, "relay_active", "1 while the relay is on.", "is_active"),
+            (DigitalInput, "digital_input_active", "1 while the input is active.", "state"),
+        ):
+            yield _family(GaugeMetricFamily, name, documentation, [model._meta.model_name],
+                          [([obj.name], int(getattr(obj, field))) for obj in registry.loaded(model)])
+
+
+def start_metrics_server(scheduler=None, port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Serves /metrics from a daemon thread.
+    :return: The HTTP server, or None if metrics are disabled (port is None).
+    """
+    if port is None:
+        return None
+    REGISTRY.register(ControllerCollector(scheduler))
+    server, _ = start_http_server(port, host)
+    print(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
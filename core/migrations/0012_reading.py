@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_log_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.PositiveIntegerField(help_text='ID of the Sensor in the default database.')),
+                ('ts', models.FloatField(help_text='Sample time as a Unix timestamp.')),
+                ('value', models.FloatField()),
+                ('valid', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sensor_id', 'ts'], name='reading_sensor_ts_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:25
+
+import core.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_log_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlarmState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text="Rule name and device, e.g. 'sensor_invalid:3'.", max_length=100, unique=True)),
+                ('active', models.BooleanField(default=False, help_text='Indicates if the alarm is currently raised.')),
+                ('condition_since', models.DateTimeField(blank=True, help_text='When the condition was first seen, while it holds.', null=True)),
+                ('raised_at', models.DateTimeField(blank=True, null=True)),
+                ('cleared_at', models.DateTimeField(blank=True, null=True)),
+                ('message', models.TextField(blank=True, default='')),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+            bases=(core.utils.DirtyFieldsMixin, models.Model),
+        ),
+    ]
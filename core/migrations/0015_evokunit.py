@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alarmstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvokUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(unique=True)),
+                ('base_url', models.CharField(help_text='EVOK JSON API URL, e.g. http://192.168.2.78:8080/json', max_length=200)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='digitalinput',
+            name='unit',
+            field=models.ForeignKey(blank=True, help_text='EVOK unit the device is wired to; empty for the default unit.', null=True, on_delete=django.db.models.deletion.PROTECT, to='core.evokunit'),
+        ),
+        migrations.AddField(
+            model_name='relay',
+            name='unit',
+            field=models.ForeignKey(blank=True, help_text='EVOK unit the device is wired to; empty for the default unit.', null=True, on_delete=django.db.models.deletion.PROTECT, to='core.evokunit'),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='unit',
+            field=models.ForeignKey(blank=True, help_text='EVOK unit the device is wired to; empty for the default unit.', null=True, on_delete=django.db.models.deletion.PROTECT, to='core.evokunit'),
+        ),
+        migrations.AddField(
+            model_name='valve',
+            name='unit',
+            field=models.ForeignKey(blank=True, help_text='EVOK unit the device is wired to; empty for the default unit.', null=True, on_delete=django.db.models.deletion.PROTECT, to='core.evokunit'),
+        ),
+    ]
@@ -1,7 +1,36 @@
 from django.db import models
 from django.utils.timezone import now
-from api.evok_client import EvokClient
+from api.evok_client import device_address, get_client
 from django.core.validators import RegexValidator
+from core.utils import DirtyFieldsMixin
+
+
+class EvokUnit(models.Model):
+    """An EVOK unit (Neuron) devices are wired to, besides the default unit at EVOK_BASE_URL."""
+    name = models.SlugField(max_length=50, unique=True)
+    base_url = models.CharField(max_length=200, help_text="EVOK JSON API URL, e.g. http://192.168.2.78:8080/json")
+
+    def __str__(self):
+        return f"{self.name} ({self.base_url})"
+
+
+class EvokDeviceMixin:
+    """For models wired to an EVOK unit through a `unit` foreign key and a `circuit`."""
+
+    @property
+    def address(self):
+        """The circuit qualified with its unit, as the EVOK clients expect it (see device_address)."""
+        return device_address(self.unit_id, self.circuit)
+
+
+def unit_field():
+    return models.ForeignKey(
+        'EvokUnit',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        help_text="EVOK unit the device is wired to; empty for the default unit."
+    )
 
 
 class Tank(models.Model):
@@ -26,8 +55,9 @@ class Tank(models.Model):
         return self.name
 
 
-class Sensor(models.Model):
+class Sensor(EvokDeviceMixin, DirtyFieldsMixin, models.Model):
     name = models.CharField(max_length=50, unique=True)
+    unit = unit_field()
     circuit = models.CharField(
         max_length=50,
         validators=[RegexValidator(r'^xG18_\d$', message="Circuit must match format 'xG18_<digit>'")],
@@ -40,6 +70,9 @@ class Sensor(models.Model):
     last_error_time = models.DateTimeField(null=True, blank=True, help_text="Time of the last detected error.")
     error_active = models.BooleanField(default=False, help_text="Indicates if the sensor is currently in error state.")
 
+    # Fields the controller updates at runtime, as opposed to configuration
+    STATE_FIELDS = ('current_temperature', 'last_updated', 'last_error_time', 'error_active')
+
     @property
     def is_faulty(self):
         """Returns True if the sensor is in an error state."""
@@ -52,25 +85,41 @@ class Sensor(models.Model):
             return (now() - self.last_error_time).total_seconds() > 60
         return False
 
-    def update_error_state(self, client=None):
-        """Updates the error state based on the 'valid' parameter from the API."""
-        client = client or EvokClient()
-        valid = client.get_sensor_status(self.circuit)
+    def update_error_state(self, client=None, reading=None, commit=True):
+        """
+        Updates the error state based on the 'valid' parameter from the API.
+        :param client: EvokClient or EvokSnapshot to read the sensor status from.
+        :param reading: SensorReading already taken this cycle; skips the read when given.
+        :param commit: Save the changed fields right away. Controllers pass False and
+                       persist all changes of a tick with core.utils.persist_dirty.
+        """
+        if reading is None:
+            client = client if client is not None else get_client()
+            reading = client.get_sensor_reading(self.address)
+        valid = reading.valid
         self.error_active = not valid
-        self.last_error_time = now() if not valid and not self.last_error_time else None
-        self.save()
+        if valid:
+            self.last_error_time = None
+        elif not self.last_error_time:
+            self.last_error_time = now()
+        dirty = self.get_dirty_fields()
+        if commit and dirty:
+            self.save(update_fields=dirty)
 
     def __str__(self):
         status = "Error" if self.error_active else "OK"
         return f"{self.name} - {self.current_temperature} °C - {status}"
 
 
-class Valve(models.Model):
+class Valve(EvokDeviceMixin, DirtyFieldsMixin, models.Model):
     name = models.CharField(max_length=50, unique=True)
+    unit = unit_field()
     circuit = models.CharField(max_length=50, help_text="EVOK API circuit ID")
     is_open = models.BooleanField(default=False)
     last_updated = models.DateTimeField(auto_now=True)
 
+    STATE_FIELDS = ('is_open', 'last_updated')
+
     def __str__(self):
         status = "Open" if self.is_open else "Closed"
         return f"{self.name} - {status}"
@@ -94,9 +143,17 @@ class Log(models.Model):
     event = models.CharField(max_length=255, blank=True, null=True)
     temperature = models.FloatField(blank=True, null=True)
     valve_state = models.BooleanField(blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the row is queued, not when a buffered bulk_create writes it
+    timestamp = models.DateTimeField(default=now, editable=False)
     message = models.TextField(default="No details provided")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['tank', 'timestamp'], name='log_tank_ts_idx'),
+            models.Index(fields=['sensor', 'timestamp'], name='log_sensor_ts_idx'),
+            models.Index(fields=['timestamp'], name='log_ts_idx'),
+        ]
+
     def __str__(self):
         if self.tank:
             return f"({self.tank.name}) at {self.timestamp}"
@@ -107,23 +164,69 @@ class Log(models.Model):
         return f"(General) at {self.timestamp}"
 
 
-class DigitalInput(models.Model):
+class Reading(models.Model):
+    """
+    One temperature sample. Stored in the history database (see core.routers)
+    with plain columns only, so the row stays small at a high sample rate.
+    """
+    sensor_id = models.PositiveIntegerField(help_text="ID of the Sensor in the default database.")
+    ts = models.FloatField(help_text="Sample time as a Unix timestamp.")
+    value = models.FloatField()
+    valid = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sensor_id', 'ts'], name='reading_sensor_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"Sensor {self.sensor_id} - {self.value} °C at {self.ts}"
+
+
+class DigitalInput(EvokDeviceMixin, DirtyFieldsMixin, models.Model):
     name = models.CharField(max_length=50, unique=True)
+    unit = unit_field()
     circuit = models.CharField(max_length=50, help_text="EVOK API circuit ID")
     state = models.BooleanField(default=False, help_text="Current state of the input")
     last_updated = models.DateTimeField(auto_now=True)
 
+    STATE_FIELDS = ('state', 'last_updated')
+
     def __str__(self):
         status = "Active" if self.state else "Inactive"
         return f"{self.name} - {status}"
 
 
-class Relay(models.Model):
+class Relay(EvokDeviceMixin, DirtyFieldsMixin, models.Model):
     name = models.CharField(max_length=50, unique=True)
+    unit = unit_field()
     circuit = models.CharField(max_length=50, help_text="EVOK API circuit ID")
     is_active = models.BooleanField(default=False, help_text="Current state of the relay")
     last_updated = models.DateTimeField(auto_now=True)
 
+    STATE_FIELDS = ('is_active', 'last_updated')
+
     def __str__(self):
         status = "Active" if self.is_active else "Inactive"
         return f"{self.name} - {status}"
+
+
+class AlarmState(DirtyFieldsMixin, models.Model):
+    """
+    Persistent state of one alarm condition: a rule from core.alarms applied to
+    one device. Kept across restarts, so pending delays continue where they left off.
+    """
+    key = models.CharField(max_length=100, unique=True, help_text="Rule name and device, e.g. 'sensor_invalid:3'.")
+    active = models.BooleanField(default=False, help_text="Indicates if the alarm is currently raised.")
+    condition_since = models.DateTimeField(null=True, blank=True,
+                                           help_text="When the condition was first seen, while it holds.")
+    raised_at = models.DateTimeField(null=True, blank=True)
+    cleared_at = models.DateTimeField(null=True, blank=True)
+    message = models.TextField(blank=True, default="")
+    last_updated = models.DateTimeField(auto_now=True)
+
+    STATE_FIELDS = ('active', 'condition_since', 'raised_at', 'cleared_at', 'message', 'last_updated')
+
+    def __str__(self):
+        status = "Active" if self.active else "Inactive"
+        return f"{self.key} - {status}"
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from api.evok_client import get_client
+from core.config import OUTPUT_RESYNC_INTERVAL
+
+
+class OutputReconciler:
+    """
+    Holds the desired state of every relay output (Relay and Valve circuits) and
+    the last state confirmed by the hardware. Controllers call set() as often as
+    they like; commit() only writes the outputs whose desired state differs from
+    the confirmed one.
+
+    inhibit is an optional callable; while it returns True (the safety interlock
+    has tripped, see core.safety) commit() writes nothing and reports every
+    output as not written. commit() holds write_lock from the inhibit check
+    until its write has finished; the interlock takes the same lock for its
+    off-write, so a controller write can never land after it.
+    """
+
+    def __init__(self, client=None, resync_interval=OUTPUT_RESYNC_INTERVAL):
+        self.client = client
+        self.resync_interval = resync_interval
+        self._desired = {}
+        self._confirmed = {}
+        self._last_resync = None
+        self._lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.inhibit = None
+        self.writes = 0
+        self.batches = 0
+        self.write_failures = 0
+        self.suppressed = 0
+
+    def set(self, circuit, value):
+        """Records the desired state of an output; nothing is written until commit()."""
+        with self._lock:
+            self._desired[circuit] = bool(value)
+
+    def desired(self, circuit):
+        return self._desired.get(circuit)
+
+    def confirmed(self, circuit):
+        return self._confirmed.get(circuit)
+
+    def inhibited(self):
+        """True while the interlock keeps every output off."""
+        return self.inhibit is not None and bool(self.inhibit())
+
+    def resync(self, snapshot=None):
+        """
+        Replaces the confirmed states with the relay states read from the hardware.
+        Outputs missing from the snapshot (or all of them without one) are
+        forgotten, so the next commit writes them again.
+        """
+        with self._lock:
+            confirmed = {}
+            if snapshot is not None:
+                for circuit in self._desired:
+                    state = snapshot.get_relay_state(circuit)
+                    if state is not None:
+                        confirmed[circuit] = bool(state)
+            self._confirmed = confirmed
+            self._last_resync = time.monotonic()
+
+    def resync_if_due(self, snapshot=None):
+        if self._last_resync is None or time.monotonic() - self._last_resync >= self.resync_interval:
+            self.resync(snapshot)
+
+    def commit(self, snapshot=None):
+        """
+        Writes every output whose desired state differs from the confirmed state.
+        :param snapshot: Cycle snapshot used for the periodic drift resync.
+        :return: Dict of circuit -> True/False for each output written.
+        """
+        with self.write_lock:
+            if self.inhibited():
+                # The interlock switched everything off; write every output again once it is reset
+                with self._lock:
+                    self._confirmed.clear()
+                    return {circuit: False for circuit in self._desired}
+            self.resync_if_due(snapshot)
+            with self._lock:
+                pending = {
+                    circuit: value for circuit, value in self._desired.items()
+                    if self._confirmed.get(circuit) != value
+                }
+                self.suppressed += len(self._desired) - len(pending)
+
+            # One bulk request for the whole tick (api.actuators)
+            client = self.client or get_client()
+            results = client.write_outputs({circuit: int(value) for circuit, value in pending.items()}) if pending else {}
+        with self._lock:
+            for circuit, success in results.items():
+                if success:
+                    self._confirmed[circuit] = pending[circuit]
+                else:
+                    # Unknown hardware state, try again on the next commit
+                    self._confirmed.pop(circuit, None)
+                    self.write_failures += 1
+            self.writes += len(results)
+            self.batches += bool(results)
+        return results
+
+
+# Shared by all controllers in the process
+outputs = OutputReconciler()
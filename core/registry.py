@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from api.evok_client import MultiUnitClient, get_client
+from core.models import DigitalInput, EvokUnit, Relay, Sensor, Tank, Valve
+from core.utils import persist_dirty
+
+CONFIG_VERSION_FILE = settings.CONFIG_VERSION_FILE
+STATE_VERSION_FILE = settings.STATE_VERSION_FILE
+
+
+def file_version(path):
+    try:
+        with open(path) as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_file_version(path):
+    # The version is the write time in nanoseconds stored in the file. File
+    # mtimes only move in clock ticks, so two bumps could share one. Each
+    # thread writes its own temporary file, so concurrent bumps cannot race.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+
+
+def config_version():
+    """
+    Returns the current configuration version. It is read from
+    CONFIG_VERSION_FILE, so every process can check it without a query.
+    """
+    return file_version(CONFIG_VERSION_FILE)
+
+
+def bump_config_version():
+    """Marks the device configuration as changed for every process."""
+    bump_file_version(CONFIG_VERSION_FILE)
+
+
+def state_version():
+    """
+    Returns a version covering the configuration, the device state and the log.
+    It changes whenever any of them is written, again without a query.
+    """
+    return f"{config_version()}.{file_version(STATE_VERSION_FILE)}"
+
+
+def bump_state_version(*args, **kwargs):
+    """
+    Marks the device state or the log as changed for every process. Accepts and
+    ignores signal arguments so it can be connected to post_save directly.
+    """
+    bump_file_version(STATE_VERSION_FILE)
+
+
+class DeviceRegistry:
+    """
+    Process-local copy of the device configuration: EVOK units, tanks, sensors,
+    valves, digital inputs and relays, indexed by id, name and address. It is
+    loaded on first use and reloaded only after the configuration version
+    changes, so the controller hot path does not query the configuration tables.
+    Every load also passes the EVOK units on to the MultiUnitClients in use.
+
+    Tanks reference the same Sensor and Valve instances the registry holds, so
+    state written by one controller is seen by the others.
+    """
+
+    MODELS = (Sensor, Valve, DigitalInput, Relay)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self.loads = 0
+        self.tanks = []
+        self._objects = {}
+        self._by_id = {}
+        self._by_name = {}
+        self._by_address = {}
+        self._clients = []
+
+    def invalidate(self):
+        self._version = None
+
+    def _load(self):
+        objects = {model: list(model.objects.all()) for model in self.MODELS}
+        by_id = {model: {obj.id: obj for obj in objs} for model, objs in objects.items()}
+        by_name = {model: {obj.name: obj for obj in objs} for model, objs in objects.items()}
+        # Circuits repeat across EVOK units, addresses do not
+        by_address = {model: {obj.address: obj for obj in objs} for model, objs in objects.items()}
+        objects[EvokUnit] = list(EvokUnit.objects.all())
+
+        tanks = list(Tank.objects.all())
+        for tank in tanks:
+            tank.sensor = by_id[Sensor].get(tank.sensor_id)
+            tank.valve = by_id[Valve].get(tank.valve_id)
+        objects[Tank] = tanks
+        by_id[Tank] = {tank.id: tank for tank in tanks}
+        by_name[Tank] = {tank.name: tank for tank in tanks}
+
+        self.tanks = tanks
+        self._objects = objects
+        self._by_id = by_id
+        self._by_name = by_name
+        self._by_address = by_address
+        self.loads += 1
+        self._configure_clients()
+
+    def unit_map(self):
+        """Returns the loaded EVOK units as {unit id: (name, base URL)}."""
+        return {unit.id: (unit.name, unit.base_url) for unit in self._objects.get(EvokUnit, ())}
+
+    def _configure_clients(self):
+        units = self.unit_map()
+        for client in (get_client(), *self._clients):
+            if isinstance(client, MultiUnitClient):
+                client.set_units(units)
+
+    def track_client(self, client):
+        """
+        Keeps another MultiUnitClient's units (besides the shared client's) in
+        step with the configuration, e.g. the safety interlock's.
+        """
+        self.ensure_loaded()
+        self._clients.append(client)
+        client.set_units(self.unit_map())
+
+    def ensure_loaded(self):
+        """Loads the configuration if it was never loaded or has changed since."""
+        version = config_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._load()
+                    self._version = version
+        return self
+
+    def all(self, model):
+        """Returns every cached object of the given model."""
+        return self.ensure_loaded()._objects[model]
+
+    def loaded(self, model):
+        """
+        Returns the objects of the model as last loaded, without checking the
+        version or loading, for readers that must never query (e.g. metrics).
+        """
+        return list(self._objects.get(model, ()))
+
+    def get(self, model, id=None, name=None, address=None):
+        """
+        Looks up one cached object by id, name or address (see Sensor.address).
+        :raises model.DoesNotExist: If no object matches, like QuerySet.get().
+        """
+        self.ensure_loaded()
+        if id is not None:
+            obj = self._by_id[model].get(id)
+        elif name is not None:
+            obj = self._by_name[model].get(name)
+        else:
+            obj = self._by_address[model].get(address)
+        if obj is None:
+            raise model.DoesNotExist(f"{model.__name__} matching id={id}, name={name}, address={address} is not configured.")
+        return obj
+
+    def persist(self):
+        """
+        Writes the changed state of every cached sensor, valve, input and relay
+        with bulk_update. Unchanged rows are not written.
+        :return: The number of rows written.
+        """
+        written = persist_dirty(obj for model in self.MODELS for obj in self._objects.get(model, ()))
+        if written:
+            bump_state_version()
+        return written
+
+    @property
+    def sensors(self):
+        return self.all(Sensor)
+
+    @property
+    def valves(self):
+        return self.all(Valve)
+
+    @property
+    def digital_inputs(self):
+        return self.all(DigitalInput)
+
+    @property
+    def relays(self):
+        return self.all(Relay)
+
+
+def invalidate_on_change(sender, instance, update_fields=None, **kwargs):
+    """
+    post_save/post_delete handler that bumps the configuration version. Saves
+    limited to a model's STATE_FIELDS (what the controller writes every cycle)
+    only bump the state version.
+    """
+    state_fields = getattr(sender, "STATE_FIELDS", ())
+    if update_fields and set(update_fields) <= set(state_fields):
+        bump_state_version()
+        return
+    bump_config_version()
+
+
+# Shared by all controllers in the process
+registry = DeviceRegistry()
@@ -0,0 +1,27 @@
+HISTORY_DB = "history"
+
+# Models (by model_name) that live in the history database
+HISTORY_MODELS = {"reading"}
+
+
+class HistoryRouter:
+    """
+    Sends high-rate telemetry to the history database (data/history.db) and
+    keeps everything else in the default database.
+    """
+
+    def _is_history(self, model):
+        return model._meta.app_label == "core" and model._meta.model_name in HISTORY_MODELS
+
+    def db_for_read(self, model, **hints):
+        return HISTORY_DB if self._is_history(model) else None
+
+    def db_for_write(self, model, **hints):
+        return HISTORY_DB if self._is_history(model) else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == "core" and model_name in HISTORY_MODELS:
+            return db == HISTORY_DB
+        if db == HISTORY_DB:
+            return False
+        return None
@@ -0,0 +1,105 @@
+"""
+Runs the safety interlock (api.safety) inside the controller process. The
+interlock gets its own EvokClient, so its requests never queue behind the
+controller's, and its trip latches the shared OutputReconciler: while tripped,
+commits write nothing and the outputs stay off.
+
+The interlock is reset from the dashboard, which may run in another process,
+by bumping SAFETY_RESET_FILE; the controller forwards the request with
+check_reset_request().
+"""
+from django.conf import settings
+
+from api.evok_client import EvokClient, MultiUnitClient, get_client
+from api.safety import SafetyInterlock
+from core.config import (
+    SAFETY_INPUTS,
+    SAFETY_MAX_MISSED_POLLS,
+    SAFETY_POLL_PERIOD,
+    SAFETY_REACTION_BUDGET,
+    SAFETY_TIMEOUT,
+)
+from core.models import DigitalInput, Relay, Valve
+from core.outputs import outputs
+from core.registry import bump_file_version, file_version, registry
+
+SAFETY_RESET_FILE = settings.SAFETY_RESET_FILE
+
+# The running interlock, set by start_interlock()
+interlock = None
+_reset_version = None
+
+
+def output_circuits():
+    """Every relay and valve circuit, from the registry's cache (no queries)."""
+    return [relay.address for relay in registry.loaded(Relay)] + [valve.address for valve in registry.loaded(Valve)]
+
+
+def build_interlock(client=None):
+    """
+    Creates the interlock for the configured safety inputs.
+    :param client: Client for the interlock; by default a dedicated client for
+        the shared client's units, with the short safety timeouts.
+    """
+    inputs = []
+    for name in SAFETY_INPUTS:
+        try:
+            inputs.append(registry.get(DigitalInput, name=name).address)
+        except DigitalInput.DoesNotExist:
+            print(f"Warning: safety input '{name}' does not exist. Please add it to the database.")
+
+    if client is None:
+        shared = get_client()
+        options = dict(thread_name="safety-evok-client", connect_timeout=SAFETY_TIMEOUT,
+                       read_timeout=SAFETY_TIMEOUT, retries=1, pool_size=4)
+        if isinstance(shared, MultiUnitClient):
+            client = MultiUnitClient(shared.base_url, **options)
+            registry.track_client(client)
+        elif isinstance(shared, EvokClient):
+            client = EvokClient(shared.base_url, **options)
+        else:
+            client = shared
+    return SafetyInterlock(client, inputs, output_circuits, period=SAFETY_POLL_PERIOD, deadline=SAFETY_TIMEOUT,
+                           reaction_budget=SAFETY_REACTION_BUDGET, max_missed=SAFETY_MAX_MISSED_POLLS,
+                           write_lock=outputs.write_lock)
+
+
+def start_interlock(client=None):
+    """Starts the interlock thread and makes the output reconciler respect its latch."""
+    global interlock, _reset_version
+    registry.ensure_loaded()
+    interlock = build_interlock(client)
+    outputs.inhibit = interlock.is_tripped
+    # Reset requests made while the controller was down do not apply
+    _reset_version = file_version(SAFETY_RESET_FILE)
+    interlock.start()
+    print(f"Safety interlock polling {', '.join(interlock.input_circuits) or 'no inputs'} "
+          f"every {interlock.period * 1000:g} ms.")
+    return interlock
+
+
+def stop_interlock():
+    if interlock is not None:
+        interlock.stop()
+        if interlock.client is not get_client():
+            interlock.client.close()
+        print(f"Safety interlock stats: {interlock.get_stats()}")
+
+
+def request_reset():
+    """Asks the controller to reset the interlock. Safe to call from any process."""
+    bump_file_version(SAFETY_RESET_FILE)
+
+
+def check_reset_request():
+    """Passes a reset requested through SAFETY_RESET_FILE on to the interlock."""
+    global _reset_version
+    version = file_version(SAFETY_RESET_FILE)
+    if version != _reset_version:
+        _reset_version = version
+        if interlock is not None:
+            interlock.request_reset()
+
+
+def is_latched():
+    return interlock is not None and interlock.tripped
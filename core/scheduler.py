@@ -0,0 +1,177 @@
+import time
+import traceback
+
+from api.evok_client import get_client
+from core.config import EVOK_INPUT_MODE, TASK_PERIODS
+
+
+class TaskStats:
+    """Timing counters for one scheduled task (all times in seconds)."""
+
+    def __init__(self):
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+        self.max_jitter = 0.0
+
+    def as_dict(self):
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "avg_lateness": self.total_lateness / self.runs if self.runs else 0.0,
+            "max_lateness": self.max_lateness,
+            "max_jitter": self.max_jitter,
+        }
+
+
+class ScheduledTask:
+    def __init__(self, name, func, period, start):
+        self.name = name
+        self.func = func
+        self.period = period
+        self.next_run = start
+        self.last_start = None
+        self.stats = TaskStats()
+
+
+class Scheduler:
+    """
+    Fixed-rate scheduler for the controller tasks. Every task has its own period;
+    the next run is computed from the previous scheduled time rather than from
+    when the task finished, so run time and sleep overshoot do not accumulate.
+    Ticks missed because of an overrun are skipped, not run back to back.
+    Tasks due at the same time run shortest period first.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.tasks = []
+
+    def add(self, name, func, period, offset=0.0):
+        """
+        Registers a task.
+        :param name: Name used in the statistics.
+        :param func: Callable run without arguments.
+        :param period: Seconds between scheduled runs.
+        :param offset: Delay of the first run, to spread tasks with equal periods.
+        """
+        self.tasks.append(ScheduledTask(name, func, period, self.clock() + offset))
+        self.tasks.sort(key=lambda task: task.period)
+
+    def _run_task(self, task, now):
+        stats = task.stats
+        lateness = now - task.next_run
+        stats.total_lateness += lateness
+        stats.max_lateness = max(stats.max_lateness, lateness)
+        if task.last_start is not None:
+            jitter = abs((now - task.last_start) - task.period)
+            stats.max_jitter = max(stats.max_jitter, jitter)
+        task.last_start = now
+
+        try:
+            task.func()
+        except Exception:
+            stats.errors += 1
+            print(f"Task '{task.name}' failed:")
+            traceback.print_exc()
+        duration = self.clock() - now
+        stats.runs += 1
+        stats.last_duration = duration
+        stats.max_duration = max(stats.max_duration, duration)
+        if duration > task.period:
+            stats.overruns += 1
+
+        task.next_run += task.period
+        end = now + duration
+        if task.next_run <= end:
+            missed = int((end - task.next_run) // task.period) + 1
+            stats.skipped += missed
+            task.next_run += missed * task.period
+
+    def run_pending(self):
+        """Runs every task that is due. Returns the time until the next one is due."""
+        for task in self.tasks:
+            now = self.clock()
+            if now >= task.next_run:
+                self._run_task(task, now)
+        return max(0.0, min(task.next_run for task in self.tasks) - self.clock())
+
+    def run(self, should_stop=lambda: False):
+        """Runs the tasks until should_stop() returns True."""
+        while not should_stop():
+            self.sleep(self.run_pending())
+
+    def get_stats(self):
+        return {task.name: task.stats.as_dict() for task in self.tasks}
+
+
+def build_scheduler(periods=TASK_PERIODS):
+    """
+    Creates the scheduler running every controller task at its configured period.
+    """
+    from core import controllers
+    from core.live import publish_state
+    from core.log_sink import flush_sinks
+    from core.metrics import instrument
+    from core.safety import check_reset_request
+
+    scheduler = Scheduler()
+
+    def add(name, func, offset=0.0):
+        # Every task records its run time and query count under its name
+        scheduler.add(name, instrument(name, func), periods[name], offset)
+
+    def report():
+        for name, stats in scheduler.get_stats().items():
+            print(
+                f"Task '{name}': {stats['runs']} runs, {stats['overruns']} overruns, "
+                f"{stats['skipped']} skipped ticks, {stats['errors']} errors, "
+                f"max {stats['max_duration'] * 1000:.1f} ms, "
+                f"max lateness {stats['max_lateness'] * 1000:.1f} ms, "
+                f"max jitter {stats['max_jitter'] * 1000:.1f} ms."
+            )
+
+    add("inputs", lambda: controllers.update_inputs_and_relays(controllers.latest_snapshot()))
+    add("sensors", lambda: controllers.update_sensors(controllers.latest_snapshot()))
+    add("regulation", lambda: controllers.regulate_temperature(controllers.latest_snapshot()))
+    add("alarms", lambda: controllers.check_and_trigger_alarm(controllers.latest_snapshot()))
+    add("flush", flush_sinks)
+    add("publish", publish_state)
+    add("safety_reset", check_reset_request)
+    add("report", report, offset=periods["report"])
+    return scheduler
+
+
+def run_controller():
+    """
+    Runs the controller until interrupted, then writes out the buffered rows.
+    """
+    from core.log_sink import flush_sinks, log_sink, reading_sink
+    from core.metrics import count_queries, start_metrics_server
+    from core.safety import start_interlock, stop_interlock
+
+    scheduler = build_scheduler()
+    count_queries()
+    if EVOK_INPUT_MODE == "websocket":
+        get_client().subscribe()
+    start_interlock()
+    start_metrics_server(scheduler)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        print("Shutting down safely...")
+    finally:
+        stop_interlock()
+        written = flush_sinks(force=True)
+        print(f"Flushed {written} buffered rows. Log sink: {log_sink.get_stats()}, reading sink: {reading_sink.get_stats()}")
+        print(f"Task stats: {scheduler.get_stats()}")
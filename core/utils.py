@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from django.db import router, transaction
+from django.utils import timezone
+
+
+class DirtyFieldsMixin:
+    """
+    Model mixin that remembers field values as they were loaded or last saved,
+    so only the fields that actually changed need to be written.
+    """
+
+    def _current_values(self):
+        return {
+            field.name: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+        }
+
+    def _mark_clean(self, fields=None):
+        values = self._current_values()
+        if fields is None or not hasattr(self, "_original_values"):
+            self._original_values = values
+        else:
+            for name in fields:
+                self._original_values[name] = values[name]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._mark_clean()
+        return instance
+
+    def get_dirty_fields(self):
+        """Returns the names of fields changed since the object was loaded or saved."""
+        original = getattr(self, "_original_values", None)
+        if original is None:
+            return [name for name in self._current_values()]
+        return [name for name, value in self._current_values().items() if original.get(name) != value]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._mark_clean(kwargs.get("update_fields"))
+
+
+def persist_dirty(objects):
+    """
+    Writes the changed fields of the given saved model instances. Rows with the
+    same model and set of changed fields are written with one bulk_update; rows
+    without changes are not written at all. A 'last_updated' field is stamped on
+    every row that is written.
+    :return: The number of rows written.
+    """
+    groups = defaultdict(lambda: defaultdict(list))
+    now = timezone.now()
+    for obj in objects:
+        dirty = obj.get_dirty_fields()
+        if not dirty:
+            continue
+        if hasattr(obj, "last_updated"):
+            obj.last_updated = now
+            dirty = set(dirty) | {"last_updated"}
+        model = type(obj)
+        groups[router.db_for_write(model)][(model, frozenset(dirty))].append(obj)
+
+    written = 0
+    for db, batches in groups.items():
+        # One short write transaction per database for the whole tick
+        with transaction.atomic(using=db):
+            for (model, fields), rows in batches.items():
+                model.objects.using(db).bulk_update(rows, sorted(fields))
+        for (model, fields), rows in batches.items():
+            for obj in rows:
+                obj._mark_clean(fields)
+            written += len(rows)
+    return written
@@ -0,0 +1,34 @@
+import os
+
+import plotly
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.files.storage import FileSystemStorage
+
+
+class PlotlyFinder(BaseFinder):
+    """
+    Exposes the plotly.js bundle shipped with the plotly Python package as the
+    static file js/plotly.min.js. The bundle is not copied into dashboard/static
+    and always matches the installed plotly version.
+    """
+
+    static_path = "js/plotly.min.js"
+    file_name = "plotly.min.js"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.storage = FileSystemStorage(location=os.path.join(os.path.dirname(plotly.__file__), "package_data"))
+        self.storage.prefix = os.path.dirname(self.static_path)
+
+    def check(self, **kwargs):
+        return []
+
+    def find(self, path, all=False):
+        if path == self.static_path and self.storage.exists(self.file_name):
+            match = self.storage.path(self.file_name)
+            return [match] if all else match
+        return [] if all else ""
+
+    def list(self, ignore_patterns):
+        if self.storage.exists(self.file_name):
+            yield self.file_name, self.storage
@@ -0,0 +1,13 @@
+from django import forms
+
+from core.models import Sensor, Tank
+
+
+class LogFilterForm(forms.Form):
+    tank = forms.ModelChoiceField(queryset=Tank.objects.order_by('name'), required=False)
+    sensor = forms.ModelChoiceField(queryset=Sensor.objects.order_by('name'), required=False)
+    event = forms.CharField(required=False, max_length=255, help_text="Matches events containing this text.")
+    start = forms.DateTimeField(required=False, label="From",
+                                widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}))
+    end = forms.DateTimeField(required=False, label="To",
+                              widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}))
@@ -0,0 +1,146 @@
+"""
+Shared broadcast of the controller's live state. One LiveBroadcaster per web
+process watches the file written by core.live, diffs each new state against
+the previous one and keeps a short history of the diffs. Every viewer's event
+stream reads from it, so the file is checked at most once per interval no
+matter how many viewers are connected.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+# Seconds between checks of the state file
+LIVE_POLL_INTERVAL = 0.5
+# Seconds between SSE comments that keep idle connections open through proxies
+LIVE_KEEPALIVE = 15.0
+# Diffs kept for viewers that fall behind; older viewers get the full state
+LIVE_HISTORY = 100
+
+
+def diff_state(old, new):
+    """
+    :return: The keys of new whose values differ from old, plus removed keys
+        mapped to None.
+    """
+    changes = {key: value for key, value in new.items() if old.get(key, object()) != value}
+    changes.update({key: None for key in old.keys() - new.keys()})
+    return changes
+
+
+class LiveBroadcaster:
+    def __init__(self, path=None, interval=LIVE_POLL_INTERVAL, history=LIVE_HISTORY, clock=time.monotonic):
+        self.path = path or settings.LIVE_STATE_FILE
+        self.interval = interval
+        self.clock = clock
+        self.state = {}
+        self.version = 0
+        self.loads = 0
+        self._changes = deque(maxlen=history)
+        self._file_id = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """
+        Loads the state file if it was replaced since the last check. Checks
+        closer together than the interval return straight away.
+        :return: The current version.
+        """
+        with self._lock:
+            now = self.clock()
+            if self._checked_at is not None and now - self._checked_at < self.interval:
+                return self.version
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return self.version
+            # The publisher replaces the file, so the inode changes on every write
+            file_id = (stat.st_ino, stat.st_mtime_ns)
+            if file_id == self._file_id:
+                return self.version
+            try:
+                with open(self.path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading live state: {e}")
+                return self.version
+            self._file_id = file_id
+            self.loads += 1
+            changes = diff_state(self.state, state)
+            if changes:
+                self.state = state
+                self.version += 1
+                self._changes.append((self.version, changes))
+            return self.version
+
+    def changes_since(self, version):
+        """
+        Returns what a viewer that has seen the given version is missing.
+        :param version: Last version sent to the viewer, 0 for a new viewer.
+        :return: (current version, changes), with the full state when the viewer
+            is new or too far behind and None when nothing changed.
+        """
+        with self._lock:
+            if version == self.version:
+                return version, None
+            oldest = self._changes[0][0] if self._changes else self.version + 1
+            if version <= 0 or version < oldest - 1 or version > self.version:
+                return self.version, dict(self.state)
+            changes = {}
+            for change_version, change in self._changes:
+                if change_version > version:
+                    changes.update(change)
+            return self.version, changes
+
+
+class LiveStream:
+    """
+    One viewer's Server-Sent Events stream: the full state first, then only the
+    keys that changed, with keepalive comments in between. chunks() serves it
+    from a WSGI worker thread, async_chunks() from an ASGI event loop.
+    """
+
+    def __init__(self, source=None, interval=LIVE_POLL_INTERVAL, keepalive=LIVE_KEEPALIVE):
+        self.source = source or broadcaster
+        self.interval = interval
+        self.keepalive = keepalive
+        self.version = 0
+        self._last_sent = time.monotonic()
+
+    def next_event(self):
+        """
+        :return: The next SSE chunk, or None when there is nothing to send yet.
+        """
+        self.source.poll()
+        self.version, changes = self.source.changes_since(self.version)
+        if changes:
+            self._last_sent = time.monotonic()
+            return f"id: {self.version}\ndata: {json.dumps(changes)}\n\n"
+        if time.monotonic() - self._last_sent >= self.keepalive:
+            self._last_sent = time.monotonic()
+            return ": keepalive\n\n"
+        return None
+
+    def chunks(self):
+        while True:
+            event = self.next_event()
+            if event:
+                yield event
+            time.sleep(self.interval)
+
+    async def async_chunks(self):
+        while True:
+            event = self.next_event()
+            if event:
+                yield event
+            await asyncio.sleep(self.interval)
+
+
+# Shared by every live viewer in the process
+broadcaster = LiveBroadcaster()
@@ -0,0 +1,99 @@
+"""
+Log browsing helpers. Pages are selected with a keyset cursor on
+(timestamp, id) instead of OFFSET, so every page is one indexed range scan no
+matter how deep it is, and nothing ever counts the table.
+"""
+from datetime import datetime
+
+from django.db.models import Q
+
+from core.models import Log
+
+LOG_PAGE_SIZE = 50
+MAX_LOG_PAGE_SIZE = 500
+# Rows fetched per query while streaming a CSV export
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = ('timestamp', 'tank__name', 'sensor__name', 'event', 'temperature', 'valve_state', 'message')
+EXPORT_HEADER = ('timestamp', 'tank', 'sensor', 'event', 'temperature', 'valve_state', 'message')
+
+
+def encode_cursor(timestamp, id):
+    return f"{timestamp.isoformat()}|{id}"
+
+
+def decode_cursor(value):
+    """
+    :return: (timestamp, id) of the row the cursor points at.
+    :raises ValueError: If the cursor is malformed.
+    """
+    timestamp, _, id = value.rpartition("|")
+    return datetime.fromisoformat(timestamp), int(id)
+
+
+def filter_logs(tank=None, sensor=None, event=None, start=None, end=None):
+    """
+    Returns the Log queryset matching the given filters (all optional).
+    :param event: Text the event must contain (case-insensitive).
+    :param start: Earliest timestamp, inclusive.
+    :param end: Latest timestamp, exclusive.
+    """
+    queryset = Log.objects.all()
+    if tank is not None:
+        queryset = queryset.filter(tank=tank)
+    if sensor is not None:
+        queryset = queryset.filter(sensor=sensor)
+    if event:
+        queryset = queryset.filter(event__icontains=event)
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lt=end)
+    return queryset
+
+
+def _older_than(queryset, cursor):
+    timestamp, id = cursor
+    return queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=id))
+
+
+def _newer_than(queryset, cursor):
+    timestamp, id = cursor
+    return queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=id))
+
+
+def logs_page(queryset, before=None, after=None, size=LOG_PAGE_SIZE):
+    """
+    Fetches one page of logs, newest first, with a single query.
+    :param before: Cursor; return the rows just older than it.
+    :param after: Cursor; return the rows just newer than it.
+    :return: (rows, has_older, has_newer)
+    """
+    if after is not None:
+        rows = list(_newer_than(queryset, after).order_by('timestamp', 'id')[:size + 1])
+        has_newer = len(rows) > size
+        rows = rows[:size]
+        rows.reverse()
+        return rows, True, has_newer
+
+    if before is not None:
+        queryset = _older_than(queryset, before)
+    rows = list(queryset.order_by('-timestamp', '-id')[:size + 1])
+    return rows[:size], len(rows) > size, before is not None
+
+
+def iter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields EXPORT_FIELDS tuples for every matching log, newest first. Rows are
+    read in keyset chunks, so memory stays flat and no read transaction is
+    held open for the whole export.
+    """
+    queryset = queryset.order_by('-timestamp', '-id').values_list('id', *EXPORT_FIELDS)
+    cursor = None
+    while True:
+        chunk = list((_older_than(queryset, cursor) if cursor else queryset)[:chunk_size])
+        for row in chunk:
+            yield row[1:]
+        if len(chunk) < chunk_size:
+            return
+        cursor = (chunk[-1][1], chunk[-1][0])
@@ -8,4 +8,52 @@ function updateTime() {
     }
 }
 
-setInterval(updateTime, 1000);
\ No newline at end of file
+setInterval(updateTime, 1000);
+
+// Live updates: elements marked with data-live="<key>" are patched in place
+// from the server's event stream.
+//   numbers/text  -> textContent, rounded to data-decimals if given
+//   true/false    -> toggles data-live-class (default: active/inactive) and
+//                    sets data-on-text/data-off-text if given
+// data-live-show="<key>" / data-live-hide="<key>" elements are shown/hidden.
+function applyLiveChanges(changes) {
+    for (const [key, value] of Object.entries(changes)) {
+        document.querySelectorAll(`[data-live="${key}"]`).forEach((element) => {
+            if (typeof value === 'boolean') {
+                const liveClass = element.dataset.liveClass;
+                if (liveClass === undefined) {
+                    element.classList.toggle('active', value);
+                    element.classList.toggle('inactive', !value);
+                } else if (liveClass) {
+                    element.classList.toggle(liveClass, value);
+                }
+                const text = value ? element.dataset.onText : element.dataset.offText;
+                if (text !== undefined) {
+                    element.textContent = text;
+                }
+            } else if (value === null) {
+                element.textContent = 'N/A';
+            } else if (element.dataset.decimals !== undefined) {
+                element.textContent = Number(value).toFixed(Number(element.dataset.decimals));
+            } else {
+                element.textContent = value;
+            }
+        });
+        document.querySelectorAll(`[data-live-show="${key}"]`).forEach((element) => {
+            element.hidden = !value;
+        });
+        document.querySelectorAll(`[data-live-hide="${key}"]`).forEach((element) => {
+            element.hidden = Boolean(value);
+        });
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const url = document.body.dataset.liveUrl;
+    if (!url || !window.EventSource || !document.querySelector('[data-live]')) {
+        return;
+    }
+    // EventSource reconnects on its own; each new stream starts with the full state
+    const source = new EventSource(url);
+    source.onmessage = (event) => applyLiveChanges(JSON.parse(event.data));
+});
@@ -0,0 +1,77 @@
+import time
+
+from core.models import Reading
+
+DEFAULT_MAX_POINTS = 1000
+MAX_POINTS_LIMIT = 10000
+DEFAULT_RANGE = 14 * 24 * 3600  # seconds of history returned when no range is given
+
+
+def lttb(points, count, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a stream of (x, y) points.
+    Only two buckets are held in memory at a time, so the input can be a
+    database iterator.
+    :param points: Iterable of (x, y) pairs sorted by x.
+    :param count: Number of pairs the iterable yields.
+    :param threshold: Number of points to keep (at least 3).
+    :return: Generator of the selected (x, y) pairs, including the first and last.
+    """
+    it = iter(points)
+    if count <= threshold or threshold < 3:
+        yield from it
+        return
+
+    every = (count - 2) / (threshold - 2)
+    index = 0
+
+    def take(end):
+        # Stops early if rows were deleted between counting and reading them
+        nonlocal index
+        chunk = []
+        while index < end:
+            point = next(it, None)
+            if point is None:
+                break
+            chunk.append(point)
+            index += 1
+        return chunk
+
+    a = take(1)[0]
+    yield a
+    current = take(int(every) + 1)
+    for i in range(threshold - 2):
+        if i == threshold - 3:
+            following = take(count)
+            avg_x, avg_y = following[-1] if following else current[-1]
+        else:
+            following = take(int((i + 2) * every) + 1)
+            if not following:
+                break
+            avg_x = sum(p[0] for p in following) / len(following)
+            avg_y = sum(p[1] for p in following) / len(following)
+
+        best, best_area = current[0], -1.0
+        for point in current:
+            area = abs((a[0] - avg_x) * (point[1] - a[1]) - (a[0] - point[0]) * (avg_y - a[1]))
+            if area > best_area:
+                best, best_area = point, area
+        yield best
+        a = best
+        current = following
+    if current:
+        yield current[-1]
+
+
+def sensor_series(sensor_id, start=None, end=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    Returns the readings of one sensor between two Unix timestamps, downsampled
+    to at most max_points points.
+    :return: (number of stored readings in the range, list of (ts, value) pairs)
+    """
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - DEFAULT_RANGE
+    readings = Reading.objects.filter(sensor_id=sensor_id, ts__gte=start, ts__lte=end)
+    count = readings.count()
+    rows = readings.order_by('ts').values_list('ts', 'value').iterator(chunk_size=2000)
+    return count, list(lttb(rows, count, max_points))
@@ -3,16 +3,26 @@ from dashboard.views import (
     tank_dashboard,
     temperature_graph,
     log_view,
+    log_export,
     set_target_temperature,
     system_status,
     deactivate_alarm,
+    reset_safety_interlock,
+    temperature_data,
+    temperature_figure,
+    live_events,
 )
 
 urlpatterns = [
     path('', tank_dashboard, name='tank_dashboard'),  # Root dashboard
     path('logs/', log_view, name='log_view'),
+    path('logs/export/', log_export, name='log_export'),
     path('set-temperature/<str:tank_name>/', set_target_temperature, name='set_target_temperature'),
     path('system-status/', system_status, name='system_status'),
     path('deactivate-alarm/', deactivate_alarm, name='deactivate_alarm'),
+    path('reset-safety-interlock/', reset_safety_interlock, name='reset_safety_interlock'),
+    path('live/', live_events, name='live_events'),
     path('dashboard/graph/<str:tank_name>/', temperature_graph, name='temperature_graph'),
+    path('dashboard/graph/<str:tank_name>/data/', temperature_data, name='temperature_data'),
+    path('dashboard/graph/<str:tank_name>/figure/', temperature_figure, name='temperature_figure'),
 ]
\ No newline at end of file
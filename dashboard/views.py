@@ -1,18 +1,99 @@
+import csv
+from datetime import datetime, timezone
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from core.models import Tank, Log, DigitalInput, Relay
-from api.evok_client import EvokClient
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from core.models import Tank, Log, DigitalInput, Relay, Reading
+from api.evok_client import get_client
+from core.registry import registry
+from core.safety import request_reset
+from dashboard.forms import LogFilterForm
+from dashboard.live import LiveStream
+from dashboard.logs import (
+    EXPORT_HEADER,
+    LOG_PAGE_SIZE,
+    MAX_LOG_PAGE_SIZE,
+    decode_cursor,
+    encode_cursor,
+    filter_logs,
+    iter_export_rows,
+    logs_page,
+)
+from dashboard.timeseries import DEFAULT_MAX_POINTS, MAX_POINTS_LIMIT, sensor_series
 import plotly.graph_objects as go
 
 
-def temperature_graph(request, tank_name):
+def _parse_timestamp(value):
+    """
+    Parses a query parameter given as Unix seconds or an ISO 8601 datetime.
+    :return: Unix timestamp, or None if the parameter is missing.
+    :raises ValueError: If the value is neither.
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"Invalid timestamp '{value}'.")
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def temperature_data(request, tank_name):
     """
-    Generates a temperature history graph for the given tank.
+    Returns the temperature history of a tank as JSON, downsampled on the server.
+    Query parameters: from, to (Unix seconds or ISO 8601) and max_points.
     """
-    tank = Tank.objects.get(name=tank_name)
-    logs = Log.objects.filter(tank=tank).order_by('timestamp')
+    tank = get_object_or_404(Tank, name=tank_name)
+    try:
+        start = _parse_timestamp(request.GET.get('from'))
+        end = _parse_timestamp(request.GET.get('to'))
+        max_points = int(request.GET.get('max_points', DEFAULT_MAX_POINTS))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    max_points = max(3, min(max_points, MAX_POINTS_LIMIT))
+
+    count, points = sensor_series(tank.sensor_id, start, end, max_points)
+    return JsonResponse({
+        'tank': tank.name,
+        'count': count,
+        'ts': [ts for ts, _ in points],
+        'values': [value for _, value in points],
+    })
+
+
+FIGURE_CACHE_TIMEOUT = 24 * 3600  # seconds
+
+
+def _temperature_figure_json(tank):
+    """
+    Returns the Plotly figure JSON for a tank's temperature history. The figure
+    is built once per new reading and cached under the newest reading's id.
+    """
+    newest_id = (
+        Reading.objects.filter(sensor_id=tank.sensor_id)
+        .order_by('-ts')
+        .values_list('id', flat=True)
+        .first()
+    )
+    cache_key = f"temperature_figure:{tank.id}:{tank.name}:{newest_id}"
+    figure_json = cache.get(cache_key)
+    if figure_json is not None:
+        return figure_json
 
-    timestamps = [log.timestamp for log in logs]
-    temperatures = [log.temperature for log in logs if log.temperature is not None]
+    _, samples = sensor_series(tank.sensor_id)
+
+    timestamps = []
+    temperatures = []
+    for ts, value in samples:
+        timestamps.append(datetime.fromtimestamp(ts, tz=timezone.utc))
+        temperatures.append(value)
 
     # Create Plotly graph
     fig = go.Figure()
@@ -29,15 +110,30 @@ def temperature_graph(request, tank_name):
         template="plotly_white"
     )
 
-    # Render the graph as a div
-    graph_div = fig.to_html(full_html=False)
+    figure_json = fig.to_json()
+    cache.set(cache_key, figure_json, FIGURE_CACHE_TIMEOUT)
+    return figure_json
+
 
+def temperature_graph(request, tank_name):
+    """
+    Displays the temperature history graph for the given tank. plotly.js is
+    loaded as a static file and the figure is fetched from temperature_figure.
+    """
+    tank = get_object_or_404(Tank, name=tank_name)
     return render(request, 'dashboard/temperature_graph.html', {
         'tank': tank,
-        'graph_div': graph_div
     })
 
 
+def temperature_figure(request, tank_name):
+    """
+    Returns the Plotly figure for the temperature history graph as JSON.
+    """
+    tank = get_object_or_404(Tank, name=tank_name)
+    return HttpResponse(_temperature_figure_json(tank), content_type='application/json')
+
+
 def tank_dashboard(request):
     """
     Displays the tank dashboard with current temperature data.
@@ -49,17 +145,84 @@ def tank_dashboard(request):
     return render(request, 'dashboard/tank_dashboard.html', context)
 
 
+def _filtered_logs(request):
+    """
+    Validates the log filter parameters.
+    :return: (form, queryset); the queryset is None if the form is invalid.
+    """
+    form = LogFilterForm(request.GET)
+    if not form.is_valid():
+        return form, None
+    return form, filter_logs(**form.cleaned_data)
+
+
+def _page_url(request, **params):
+    query = request.GET.copy()
+    for key in ('before', 'after'):
+        query.pop(key, None)
+    query.update(params)
+    return f"?{query.urlencode()}"
+
+
 def log_view(request):
     """
-    Displays a list of recent logs.
+    Displays the logs, newest first, filtered by tank, sensor, event and time
+    range. Pages are addressed with ?before=/?after= cursors.
     """
-    logs = Log.objects.select_related('tank').order_by('-timestamp')[:50]
+    form, queryset = _filtered_logs(request)
     context = {
-        'logs': logs,
+        'form': form,
+        'logs': [],
     }
+    if queryset is None:
+        return render(request, 'dashboard/logs.html', context, status=400)
+
+    try:
+        before = decode_cursor(request.GET['before']) if request.GET.get('before') else None
+        after = decode_cursor(request.GET['after']) if request.GET.get('after') else None
+        size = max(1, min(int(request.GET.get('size', LOG_PAGE_SIZE)), MAX_LOG_PAGE_SIZE))
+    except ValueError:
+        return HttpResponse("Invalid page cursor.", status=400)
+
+    logs, has_older, has_newer = logs_page(
+        queryset.select_related('tank', 'sensor'), before=before, after=after, size=size
+    )
+    if logs and has_older:
+        context['older_url'] = _page_url(request, before=encode_cursor(logs[-1].timestamp, logs[-1].id))
+    if logs and has_newer:
+        context['newer_url'] = _page_url(request, after=encode_cursor(logs[0].timestamp, logs[0].id))
+    context['logs'] = logs
+    context['export_url'] = f"{reverse('log_export')}{_page_url(request)}"
     return render(request, 'dashboard/logs.html', context)
 
 
+class _Echo:
+    """File-like object that returns what is written, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def log_export(request):
+    """
+    Streams every log matching the log view's filters as CSV, newest first.
+    """
+    form, queryset = _filtered_logs(request)
+    if queryset is None:
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield writer.writerow(EXPORT_HEADER)
+        for row in iter_export_rows(queryset):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="logs.csv"'
+    return response
+
+
 def set_target_temperature(request, tank_name):
     """
     Allows the user to set the target temperature for a tank using its name.
@@ -97,6 +260,27 @@ def system_status(request):
     return render(request, 'dashboard/system_status.html', context)
 
 
+def live_events(request):
+    """
+    Server-Sent Events stream of live state changes. The first event carries the
+    full state, later events only the keys that changed. All streams share the
+    process-wide broadcaster, so viewers cost no database queries.
+
+    Under WSGI (runserver) each viewer holds a worker thread for as long as the
+    page is open; under an ASGI server the streams share the event loop.
+    """
+    stream = LiveStream()
+    if isinstance(request, ASGIRequest):
+        chunks = stream.async_chunks()
+    else:
+        chunks = stream.chunks()
+
+    response = StreamingHttpResponse(chunks, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
+
 def deactivate_alarm(request):
     """
     Deactivates the alarm manually.
@@ -106,11 +290,23 @@ def deactivate_alarm(request):
         alarm_relay.is_active = False
         alarm_relay.save()
 
-        client = EvokClient()
-        client.set_relay(alarm_relay.circuit, 0)  # Turn off alarm relay
+        registry.ensure_loaded()  # Configures the client's EVOK units
+        client = get_client()
+        client.set_relay(alarm_relay.address, 0)  # Turn off alarm relay
 
         Log.objects.create(message="Alarm manually deactivated.")
     return redirect('system_status')
 
 
+def reset_safety_interlock(request):
+    """
+    Asks the controller to reset the latched safety interlock. The controller
+    refuses while Total Stop is still active.
+    """
+    if request.method == "POST":
+        request_reset()
+        Log.objects.create(message="Safety interlock reset requested.")
+    return redirect('system_status')
+
+
 
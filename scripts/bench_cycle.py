@@ -0,0 +1,227 @@
+"""
+Controller cycle benchmark. Runs take_snapshot, update_sensors,
+update_inputs_and_relays and regulate_temperature against N simulated tanks
+served by one or more EVOK stand-ins (api.evok_server), using throwaway
+databases.
+
+Reports cycle latency (p50/p99), HTTP requests per cycle and DB queries per
+cycle, and compares them with the stored baseline for the same scenario.
+Exits with status 1 if a metric regressed.
+
+Usage:
+    python -m scripts.bench_cycle [--tanks 8] [--cycles 200] [--latency 0.002]
+        [--jitter 0.002] [--error-rate 0] [--no-listing] [--units 1] [--websocket]
+        [--save-baseline]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, redirect_stdout
+from pathlib import Path
+
+import django
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines" / "cycle.json"
+
+# Allowed slowdown before latency counts as a regression: relative, and an
+# absolute floor so noise on sub-millisecond cycles does not trip it.
+LATENCY_TOLERANCE = 0.25
+LATENCY_FLOOR_MS = 0.5
+COUNT_METRICS = ("http_per_cycle", "queries_per_cycle")
+LATENCY_METRICS = ("p50_ms", "p99_ms")
+
+
+def setup_django(directory):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "FermentationController.settings")
+    django.setup()
+
+    from django.db import connections
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    # File databases, so the SQLite pragmas and fsyncs are part of the measurement
+    for alias in ("default", "history"):
+        connection = connections[alias]
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, f"{alias}.db")
+        connection.creation.create_test_db(verbosity=0)
+
+
+def create_plant(servers, urls, tanks):
+    """
+    Creates the configuration for N tanks and the matching stand-in devices.
+    Tanks are spread over the servers; the first one is the default unit.
+    :return: List of (server, sensor circuit) for every tank.
+    """
+    from core.models import DigitalInput, EvokUnit, Relay, Sensor, Tank, Valve
+
+    units = [None] + [EvokUnit.objects.create(name=f"unit-{n}", base_url=url) for n, url in enumerate(urls[1:], 2)]
+    sensors = []
+    for i in range(1, tanks + 1):
+        server, unit = servers[(i - 1) % len(servers)], units[(i - 1) % len(servers)]
+        sensor = Sensor.objects.create(name=f"Sensor_{i}", circuit=f"xG18_{i}", unit=unit)
+        valve = Valve.objects.create(name=f"Valve_{i}", circuit=f"3_{i:02d}", unit=unit)
+        Tank.objects.create(name=f"Tank_{i}", sensor=sensor, valve=valve, target_temperature=18.0)
+        server.add_device("data_point", sensor.circuit, value=18.0, valid=True)
+        server.add_device("ro", valve.circuit, value=0)
+        sensors.append((server, sensor.circuit))
+
+    server = servers[0]
+
+    for name, circuit in (("Total_Stop_DI", "1_01"), ("Pump_DI", "1_02"), ("Chiller_DI", "1_03")):
+        DigitalInput.objects.create(name=name, circuit=circuit)
+        server.add_device("di", circuit, value=0)
+    for name, circuit in (("Alarm_Relay", "2_01"), ("Pump_Relay", "2_02"), ("Chiller_Relay", "2_03")):
+        Relay.objects.create(name=name, circuit=circuit)
+        server.add_device("ro", circuit, value=0)
+    return sensors
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_cycles(servers, sensors, cycles, warmup, seed):
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    from core import controllers
+    from core.log_sink import flush_sinks
+
+    rng = random.Random(seed)
+    durations = []
+    requests = []
+    queries = []
+    for i in range(warmup + cycles):
+        # Temperatures wander around the target so valves open and close
+        for server, circuit in sensors:
+            server.set_value("data_point", circuit, round(18.0 + rng.uniform(-1.0, 1.0), 2))
+
+        requests_before = sum(server.request_count for server in servers)
+        with ExitStack() as stack:
+            # The controllers print a line per device; keep the report readable
+            stack.enter_context(redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+            captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in ("default", "history")]
+            start = time.perf_counter()
+            snapshot = controllers.take_snapshot()
+            controllers.update_sensors(snapshot)
+            controllers.update_inputs_and_relays(snapshot)
+            controllers.regulate_temperature(snapshot)
+            flush_sinks()
+            duration = time.perf_counter() - start
+
+        if i >= warmup:
+            durations.append(duration)
+            requests.append(sum(server.request_count for server in servers) - requests_before)
+            queries.append(sum(len(capture.captured_queries) for capture in captured))
+
+    return {
+        "cycles": cycles,
+        "p50_ms": round(statistics.median(durations) * 1000, 3),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.mean(durations) * 1000, 3),
+        "http_per_cycle": round(statistics.mean(requests), 2),
+        "queries_per_cycle": round(statistics.mean(queries), 2),
+        "server_errors": sum(server.error_count for server in servers),
+    }
+
+
+def compare(result, baseline):
+    """
+    :return: List of regression messages, empty if none.
+    """
+    regressions = []
+    for metric in COUNT_METRICS:
+        if result[metric] > baseline[metric] + 0.01:
+            regressions.append(f"{metric}: {baseline[metric]} -> {result[metric]}")
+    for metric in LATENCY_METRICS:
+        limit = max(baseline[metric] * (1 + LATENCY_TOLERANCE), baseline[metric] + LATENCY_FLOOR_MS)
+        if result[metric] > limit:
+            regressions.append(f"{metric}: {baseline[metric]} -> {result[metric]} (limit {limit:.3f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controller cycle benchmark against the EVOK stand-in.")
+    parser.add_argument("--tanks", type=int, default=8, help="Number of simulated tanks.")
+    parser.add_argument("--cycles", type=int, default=200, help="Measured cycles.")
+    parser.add_argument("--warmup", type=int, default=5, help="Cycles run before measuring.")
+    parser.add_argument("--latency", type=float, default=0.002, help="Stand-in response latency (seconds).")
+    parser.add_argument("--jitter", type=float, default=0.002, help="Extra random latency, up to (seconds).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with HTTP 500.")
+    parser.add_argument("--no-listing", action="store_true", help="Disable /json/all so every device is read on its own.")
+    parser.add_argument("--units", type=int, default=1, help="EVOK units (stand-ins) the tanks are spread over.")
+    parser.add_argument("--websocket", action="store_true",
+                        help="Read device state from the stand-in's WebSocket events instead of polling.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for latency, errors and temperatures.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Baseline file.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the scenario's baseline.")
+    args = parser.parse_args()
+
+    scenario = (
+        f"tanks={args.tanks} latency={args.latency * 1000:g}ms jitter={args.jitter * 1000:g}ms "
+        f"errors={args.error_rate:g} listing={'no' if args.no_listing else 'yes'}"
+    )
+    if args.units > 1:
+        scenario += f" units={args.units}"
+    if args.websocket:
+        scenario += " websocket=yes"
+
+    with tempfile.TemporaryDirectory(prefix="bench-cycle-") as directory:
+        setup_django(directory)
+
+        from api.evok_client import MultiUnitClient, set_client
+        from api.evok_server import EvokStandIn
+
+        servers = [
+            EvokStandIn(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        listing=not args.no_listing, seed=args.seed + n)
+            for n in range(args.units)
+        ]
+        urls = [server.start_in_thread() for server in servers]
+        client = MultiUnitClient(urls[0])
+        set_client(client)
+        sensors = create_plant(servers, urls, args.tanks)
+        if args.websocket:
+            subscription = client.subscribe()
+            while not subscription.ready:
+                time.sleep(0.01)
+        try:
+            result = run_cycles(servers, sensors, args.cycles, args.warmup, args.seed)
+        finally:
+            client.close()
+            for server in servers:
+                server.stop_thread()
+
+    print(f"Scenario: {scenario}")
+    for key, value in result.items():
+        print(f"  {key}: {value}")
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baselines[scenario] = result
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline saved to {args.baseline}.")
+        return 0
+
+    if scenario not in baselines:
+        print("No baseline for this scenario; run with --save-baseline to store one.")
+        return 0
+    regressions = compare(result, baselines[scenario])
+    if regressions:
+        print("REGRESSION against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regression against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
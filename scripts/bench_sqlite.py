@@ -0,0 +1,136 @@
+"""
+Measures SQLite write throughput and read latency while the controller and the
+dashboard use the database at the same time, with the default settings and
+with the pragmas from core.db.
+
+One writer process stands in for the controller (a short transaction per tick
+inserting a batch of log rows); reader processes stand in for dashboard
+requests (latest rows for a tank).
+
+Usage: python -m scripts.bench_sqlite [--seconds 5] [--readers 4] [--batch 20]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from core.db import SQLITE_PRAGMAS, apply_pragmas
+
+SCHEMA = """
+CREATE TABLE log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tank_id INTEGER,
+    sensor_id INTEGER,
+    event VARCHAR(50),
+    temperature REAL,
+    timestamp REAL,
+    message TEXT
+);
+CREATE INDEX log_tank_ts_idx ON log (tank_id, timestamp);
+"""
+
+
+def connect(path, tuned):
+    # Python's sqlite3 waits 5 s on a locked database by default; the tuned case
+    # relies on busy_timeout instead, so both wait the same time.
+    connection = sqlite3.connect(path, timeout=0 if tuned else 5.0, isolation_level=None)
+    if tuned:
+        apply_pragmas(connection.cursor())
+    return connection
+
+
+def writer(path, tuned, stop_at, batch, results):
+    connection = connect(path, tuned)
+    written = errors = 0
+    while time.time() < stop_at:
+        now = time.time()
+        rows = [(i % 4, i, "temperature_reading", 18.0 + i % 5, now, "") for i in range(batch)]
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO log (tank_id, sensor_id, event, temperature, timestamp, message) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            connection.execute("COMMIT")
+            written += batch
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+    connection.close()
+    results.put(("writer", written, errors, []))
+
+
+def reader(path, tuned, stop_at, results):
+    connection = connect(path, tuned)
+    latencies = []
+    errors = 0
+    tank = 0
+    while time.time() < stop_at:
+        start = time.perf_counter()
+        try:
+            connection.execute(
+                "SELECT id, temperature, timestamp FROM log WHERE tank_id = ? "
+                "ORDER BY timestamp DESC LIMIT 200", (tank,)).fetchall()
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError:
+            errors += 1
+        tank = (tank + 1) % 4
+    connection.close()
+    results.put(("reader", len(latencies), errors, latencies))
+
+
+def run(tuned, seconds, readers, batch):
+    directory = tempfile.mkdtemp(prefix="bench-sqlite-")
+    path = os.path.join(directory, "bench.db")
+    connection = connect(path, tuned)
+    connection.executescript(SCHEMA)
+    connection.close()
+
+    results = multiprocessing.Queue()
+    stop_at = time.time() + seconds
+    processes = [multiprocessing.Process(target=writer, args=(path, tuned, stop_at, batch, results))]
+    processes += [multiprocessing.Process(target=reader, args=(path, tuned, stop_at, results)) for _ in range(readers)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    written = sum(count for role, count, _, _ in collected if role == "writer")
+    write_errors = sum(errors for role, _, errors, _ in collected if role == "writer")
+    read_errors = sum(errors for role, _, errors, _ in collected if role == "reader")
+    latencies = sorted(latency for role, _, _, values in collected if role == "reader" for latency in values)
+
+    label = "tuned (WAL)" if tuned else "default"
+    print(f"{label}:")
+    print(f"  writes: {written / seconds:.0f} rows/s, {write_errors} failed transactions")
+    if latencies:
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"  reads:  {len(latencies) / seconds:.0f} queries/s, "
+              f"p50 {statistics.median(latencies) * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms, "
+              f"max {latencies[-1] * 1000:.2f} ms, {read_errors} failed")
+    else:
+        print(f"  reads:  none completed, {read_errors} failed")
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent reader processes.")
+    parser.add_argument("--batch", type=int, default=20, help="Rows inserted per write transaction.")
+    args = parser.parse_args()
+
+    print(f"Pragmas: {SQLITE_PRAGMAS}")
+    for tuned in (False, True):
+        run(tuned, args.seconds, args.readers, args.batch)
+
+
+if __name__ == "__main__":
+    main()
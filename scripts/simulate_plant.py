@@ -0,0 +1,145 @@
+"""
+Closed-loop run of the controllers against the thermal plant simulator
+(api.simulator). Each tick advances the plant by --tick simulated seconds,
+then runs take_snapshot, update_sensors, update_inputs_and_relays and
+regulate_temperature on throwaway databases.
+
+Reports setpoint error, valve switch counts and controller compute time per
+tick for every simulated hour and for the whole run.
+
+Usage:
+    python -m scripts.simulate_plant [--tanks 200] [--hours 24] [--tick 2]
+        [--speedup 0] [--noise 0.05] [--seed 1]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from scripts.bench_cycle import percentile, setup_django
+
+# Fermentation targets (°C) tanks are assigned from: lagers and ales
+TARGETS = (10.0, 12.0, 18.0, 20.0)
+
+
+def create_plant(tanks, noise, seed):
+    """
+    Creates the configuration for N tanks and the plant that simulates them.
+    :return: (plant, client, target temperatures as an array)
+    """
+    from api.simulator import SimulatedEvokClient, ThermalPlant
+    from core.models import DigitalInput, Relay, Sensor, Tank, Valve
+
+    rng = np.random.default_rng(seed)
+    targets = rng.choice(TARGETS, tanks)
+    sensors = Sensor.objects.bulk_create(
+        Sensor(name=f"Sensor_{i}", circuit=f"xG18_{i}") for i in range(1, tanks + 1)
+    )
+    valves = Valve.objects.bulk_create(
+        Valve(name=f"Valve_{i}", circuit=f"3_{i:04d}") for i in range(1, tanks + 1)
+    )
+    Tank.objects.bulk_create(
+        Tank(name=f"Tank_{i + 1}", sensor=sensor, valve=valve, target_temperature=float(target))
+        for i, (sensor, valve, target) in enumerate(zip(sensors, valves, targets))
+    )
+    inputs = {"1_01": 0, "1_02": 0, "1_03": 0}
+    relays = {"2_01": 0, "2_02": 0, "2_03": 0}
+    for name, circuit in zip(("Total_Stop_DI", "Pump_DI", "Chiller_DI"), inputs):
+        DigitalInput.objects.create(name=name, circuit=circuit)
+    for name, circuit in zip(("Alarm_Relay", "Pump_Relay", "Chiller_Relay"), relays):
+        Relay.objects.create(name=name, circuit=circuit)
+
+    # Pitched at 20 °C, with fermentation peaking between 1 and 3 days in
+    plant = ThermalPlant(tanks, initial=20.0, peak_time=rng.uniform(24, 72, tanks) * 3600,
+                         peak_heat=rng.uniform(100, 300, tanks), noise=noise, seed=seed)
+    client = SimulatedEvokClient(plant, [s.circuit for s in sensors], [v.circuit for v in valves], inputs, relays)
+    return plant, client, targets
+
+
+def summarize(errors, compute_times, switches, ticks):
+    abs_errors = np.abs(np.concatenate(errors))
+    return (
+        f"mean |error| {abs_errors.mean():.2f} °C, max {abs_errors.max():.2f} °C, "
+        f"{switches} valve switches ({switches / ticks:.1f} per tick), "
+        f"compute p50 {statistics.median(compute_times) * 1000:.1f} ms, "
+        f"p99 {percentile(compute_times, 0.99) * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop controller run against the thermal plant simulator.")
+    parser.add_argument("--tanks", type=int, default=200, help="Number of simulated tanks.")
+    parser.add_argument("--hours", type=float, default=24.0, help="Simulated hours to run.")
+    parser.add_argument("--tick", type=float, default=2.0, help="Simulated seconds per controller tick.")
+    parser.add_argument("--speedup", type=float, default=0.0,
+                        help="Simulated seconds per real second; 0 runs as fast as possible.")
+    parser.add_argument("--noise", type=float, default=0.05, help="Sensor noise standard deviation (°C).")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the plant parameters and noise.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="simulate-plant-") as directory:
+        setup_django(directory)
+
+        from api.evok_client import set_client
+        from core import controllers
+        from core.log_sink import flush_sinks
+
+        plant, client, targets = create_plant(args.tanks, args.noise, args.seed)
+        set_client(client)
+
+        ticks = int(args.hours * 3600 / args.tick)
+        ticks_per_hour = max(1, int(3600 / args.tick))
+        hour_errors, hour_compute, run_compute = [], [], []
+        hour_switches = 0
+        plant_time = 0.0
+        run_start = time.perf_counter()
+
+        for tick in range(1, ticks + 1):
+            tick_start = time.perf_counter()
+            plant.step(args.tick)
+            plant_time += time.perf_counter() - tick_start
+
+            switches_before = int(plant.valve_switches.sum())
+            start = time.perf_counter()
+            # The controllers print a line per device; keep the report readable
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                snapshot = controllers.take_snapshot()
+                controllers.update_sensors(snapshot)
+                controllers.update_inputs_and_relays(snapshot)
+                controllers.regulate_temperature(snapshot)
+                flush_sinks()
+            compute = time.perf_counter() - start
+
+            hour_switches += int(plant.valve_switches.sum()) - switches_before
+            hour_errors.append(plant.temperature - targets)
+            hour_compute.append(compute)
+            run_compute.append(compute)
+
+            if tick % ticks_per_hour == 0 or tick == ticks:
+                hour = plant.time / 3600
+                print(f"Hour {hour:5.1f}: {summarize(hour_errors, hour_compute, hour_switches, len(hour_compute))}, "
+                      f"{plant.valve_open.mean() * 100:.0f}% valves open.")
+                hour_errors, hour_compute, hour_switches = [], [], 0
+
+            if args.speedup:
+                time.sleep(max(0.0, args.tick / args.speedup - (time.perf_counter() - tick_start)))
+
+        elapsed = time.perf_counter() - run_start
+        final_error = np.abs(plant.temperature - targets)
+        print(f"Simulated {args.hours:g} h of {args.tanks} tanks in {elapsed:.1f} s "
+              f"({plant.time / elapsed:.0f}x real time).")
+        print(f"  Final |error|: mean {final_error.mean():.2f} °C, max {final_error.max():.2f} °C.")
+        print(f"  Valve switches: {int(plant.valve_switches.sum())} total, "
+              f"{plant.valve_switches.sum() / args.tanks / args.hours:.1f} per tank per hour, "
+              f"max {int(plant.valve_switches.max())} on one tank.")
+        print(f"  Controller compute per tick: p50 {statistics.median(run_compute) * 1000:.1f} ms, "
+              f"p99 {percentile(run_compute, 0.99) * 1000:.1f} ms, max {max(run_compute) * 1000:.1f} ms.")
+        print(f"  Plant step per tick: {plant_time / ticks * 1000:.3f} ms.")
+
+
+if __name__ == "__main__":
+    main()
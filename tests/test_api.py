@@ -0,0 +1,379 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from api.evok_client import AsyncEvokClient, CircuitBreaker, EvokClient, MultiUnitClient
+from api.evok_server import EvokStandIn
+from api.safety import SafetyInterlock
+from api.simulator import SimulatedEvokClient, ThermalPlant
+from core.outputs import OutputReconciler
+from core.models import Relay, Sensor, Tank
+
+
+class AsyncEvokClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = EvokStandIn()
+        self.server.add_device("data_point", "xG18_1", value=18.5, valid=True)
+        self.server.add_device("data_point", "xG18_2", value=21.0, valid=False)
+        self.server.add_device("di", "1_01", value=1)
+        self.server.add_device("ro", "2_01", value=0)
+
+    def read(self, devices, deadline=None, **kwargs):
+        async def run():
+            base_url = await self.server.start()
+            client = AsyncEvokClient(base_url, **kwargs)
+            try:
+                start = time.perf_counter()
+                snapshot = await client.read_devices(devices, deadline)
+                return snapshot, time.perf_counter() - start
+            finally:
+                await client.close()
+                await self.server.stop()
+
+        return asyncio.run(run())
+
+    def test_read_devices_fans_out(self):
+        snapshot, _ = self.read([("data_point", "xG18_1"), ("data_point", "xG18_2"), ("di", "1_01"), ("ro", "2_01")])
+
+        self.assertEqual(len(snapshot), 4)
+        self.assertEqual(snapshot.get_temperature("xG18_1"), 18.5)
+        self.assertFalse(snapshot.get_sensor_status("xG18_2"))
+        self.assertEqual(snapshot.get_digital_input_state("1_01"), 1)
+        self.assertEqual(snapshot.get_relay_state("2_01"), 0)
+
+    def test_reads_run_concurrently(self):
+        for i in range(8):
+            self.server.add_device("di", f"3_0{i}", delay=0.2, value=0)
+
+        snapshot, elapsed = self.read([("di", f"3_0{i}") for i in range(8)], concurrency=8)
+
+        self.assertEqual(len(snapshot), 8)
+        self.assertLess(elapsed, 1.0)
+
+    def test_deadline_drops_slow_reads(self):
+        self.server.add_device("data_point", "xG18_3", delay=2.0, value=30.0, valid=True)
+
+        snapshot, elapsed = self.read([("data_point", "xG18_1"), ("data_point", "xG18_3")], deadline=0.3)
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(snapshot.get_temperature("xG18_1"), 18.5)
+        self.assertIsNone(snapshot.get_temperature("xG18_3"))
+        self.assertFalse(snapshot.get_sensor_status("xG18_3"))
+
+
+class EvokStandInTests(SimpleTestCase):
+    def test_simulated_latency_and_errors(self):
+        server = EvokStandIn(latency=0.05, error_rate=1.0, listing=False)
+        server.add_device("di", "1_01", value=1)
+        client = EvokClient(server.start_in_thread(), retries=1)
+        try:
+            start = time.perf_counter()
+            self.assertIsNone(client.get_digital_input_state("1_01"))
+            self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+            server.error_rate = 0.0
+            self.assertIsNone(client.get_snapshot())
+            self.assertEqual(client.get_digital_input_state("1_01"), 1)
+        finally:
+            client.close()
+            server.stop_thread()
+
+        self.assertEqual(server.error_count, 1)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.server = EvokStandIn()
+        self.server.add_device("di", "1_01", value=1)
+        self.server.add_device("di", "1_02", delay=0.5, value=1)
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        self.client = EvokClient(self.server.start_in_thread(), retries=1, breaker=self.breaker)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop_thread()
+
+    def open_breaker(self):
+        self.server.error_rate = 1.0
+        self.assertIsNone(self.client.get_digital_input_state("1_01"))
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.server.error_rate = 0.0
+        time.sleep(0.06)
+
+    def test_non_transient_trial_frees_the_trial_slot(self):
+        self.open_breaker()
+
+        # The half-open trial gets a 404, which says nothing about the unit's health
+        self.assertIsNone(self.client.get_digital_input_state("9_99"))
+        self.assertEqual(self.client.get_digital_input_state("1_01"), 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_deadline_cancellation_frees_the_trial_slot(self):
+        # A slow but healthy unit missing the cycle deadline is not a failure...
+        self.assertEqual(len(self.client.read_devices([("di", "1_02")], 0.05)), 0)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+        # ...and a cancelled half-open trial does not keep the breaker from recovering
+        self.open_breaker()
+        self.assertEqual(len(self.client.read_devices([("di", "1_02")], 0.05)), 0)
+        self.assertEqual(self.client.get_digital_input_state("1_01"), 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+class ThermalPlantTests(SimpleTestCase):
+    def test_closed_valves_warm_and_open_valves_cool(self):
+        plant = ThermalPlant(2, initial=18.0, ambient=18.0, peak_time=0.0)
+        client = SimulatedEvokClient(plant, ["xG18_1", "xG18_2"], ["3_01", "3_02"])
+
+        self.assertTrue(client.set_relay("3_02", 1))
+        plant.step(3600)
+
+        snapshot = client.get_snapshot()
+        self.assertGreater(snapshot.get_temperature("xG18_1"), 18.0)
+        self.assertLess(snapshot.get_temperature("xG18_2"), 17.0)
+        self.assertEqual(snapshot.get_relay_state("3_02"), 1)
+        self.assertEqual(plant.valve_switches.tolist(), [0, 1])
+        self.assertFalse(client.set_relay("9_99", 1))
+
+    def test_large_steps_stay_stable(self):
+        plant = ThermalPlant(1, initial=20.0, glycol=-2.0, peak_heat=0.0, ambient_ua=0.0)
+        plant.set_valve(0, True)
+        plant.step(10 * 24 * 3600)
+
+        self.assertAlmostEqual(plant.temperature[0], -2.0, places=3)
+
+
+class EvokClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = EvokStandIn()
+        self.server.add_device("data_point", "xG18_1", value=18.5, valid=True)
+        self.server.add_device("ro", "2_01", value=0)
+        self.client = EvokClient(self.server.start_in_thread())
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop_thread()
+
+    def test_sync_calls_wrap_async_client(self):
+        self.assertEqual(self.client.get_temperature("xG18_1"), 18.5)
+        self.assertTrue(self.client.get_sensor_status("xG18_1"))
+        self.assertTrue(self.client.set_relay("2_01", 1))
+        self.assertEqual(self.client.get_relay_state("2_01"), 1)
+        self.assertEqual(self.client.get_snapshot().get_relay_state("2_01"), 1)
+        self.assertIsNone(self.client.get_digital_input_state("9_99"))
+        self.assertEqual(self.client.get_stats()["ro"]["requests"], 2)
+
+    def test_write_outputs_in_one_bulk_request(self):
+        self.server.add_devices("ro", ["3_01", "3_02"], value=0)
+
+        results = self.client.write_outputs({"2_01": 1, "3_01": 1, "3_02": 1, "9_99": 1})
+
+        self.assertEqual(results, {"2_01": True, "3_01": True, "3_02": True, "9_99": False})
+        self.assertEqual(self.server.bulk_count, 1)
+        self.assertNotIn("ro", self.client.get_stats())
+
+        # Without the bulk endpoint every circuit is written on its own
+        self.server.bulk = False
+        results = self.client.write_outputs({"2_01": 0, "3_01": 0, "9_99": 0})
+
+        self.assertEqual(results, {"2_01": True, "3_01": True, "9_99": False})
+        self.assertEqual(self.server.devices[("ro", "3_01")]["value"], 0)
+        self.assertEqual(self.client.get_stats()["ro"]["requests"], 3)
+
+
+class MultiUnitClientTests(SimpleTestCase):
+    def setUp(self):
+        # Both units use the same circuit numbers; the second one is slow
+        self.servers = [EvokStandIn(), EvokStandIn(latency=1.0)]
+        for server, value in zip(self.servers, (18.0, 4.0)):
+            server.add_device("data_point", "xG18_1", value=value, valid=True)
+            server.add_device("ro", "2_01", value=0)
+        urls = [server.start_in_thread() for server in self.servers]
+        self.client = MultiUnitClient(urls[0], units={7: ("cellar-2", urls[1])})
+
+    def tearDown(self):
+        self.client.close()
+        for server in self.servers:
+            server.stop_thread()
+
+    def test_units_are_read_concurrently_within_the_deadline(self):
+        start = time.perf_counter()
+        snapshot = self.client.read_state([("data_point", "xG18_1"), ("data_point", "7/xG18_1")], deadline=0.3)
+
+        self.assertLess(time.perf_counter() - start, 0.8)
+        self.assertEqual(snapshot.get_temperature("xG18_1"), 18.0)
+        self.assertIsNone(snapshot.get_temperature("7/xG18_1"))
+
+        self.servers[1].latency = 0.0
+        self.assertEqual(self.client.write_outputs({"2_01": 1, "7/2_01": 1, "9/2_01": 1}),
+                         {"2_01": True, "7/2_01": True, "9/2_01": False})
+        self.assertEqual([server.devices[("ro", "2_01")]["value"] for server in self.servers], [1, 1])
+        self.assertEqual(self.client.get_sensor_reading("7/xG18_1").value, 4.0)
+        self.assertEqual(set(self.client.get_unit_health()), {"default", "cellar-2"})
+
+
+class EvokSubscriptionTests(SimpleTestCase):
+    def setUp(self):
+        self.server = EvokStandIn()
+        self.server.add_device("di", "1_01", value=0)
+        self.server.add_device("ro", "2_01", value=0)
+        self.client = EvokClient(self.server.start_in_thread())
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop_thread()
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 2.0
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_state_table_follows_events_and_falls_back_to_polling(self):
+        subscription = self.client.subscribe(reconnect_delay=0.2)
+        self.wait_for(lambda: subscription.ready)
+        requests = self.server.request_count
+
+        self.server.set_value("di", "1_01", 1)
+        self.assertTrue(self.client.set_relay("2_01", 1))
+        self.wait_for(lambda: self.client.get_snapshot().get_relay_state("2_01") == 1)
+        self.assertEqual(self.client.get_snapshot().get_digital_input_state("1_01"), 1)
+        self.assertEqual(self.server.request_count, requests + 1)  # Only the relay write
+
+        self.server.drop_websockets()
+        self.wait_for(lambda: not subscription.ready)
+        self.server.set_value("di", "1_01", 0)
+        self.assertEqual(self.client.get_snapshot().get_digital_input_state("1_01"), 0)
+        self.assertEqual(self.server.request_count, requests + 2)
+
+        self.wait_for(lambda: subscription.ready)
+        self.assertEqual(subscription.drops, 1)
+        self.assertEqual(subscription.connects, 2)
+
+    def test_short_pulses_and_malformed_events(self):
+        subscription = self.client.subscribe()
+        self.wait_for(lambda: subscription.ready)
+
+        self.server.send_event(["not", "a", "device"])
+        self.server.set_value("di", "1_01", 1)
+        self.server.set_value("di", "1_01", 0)
+        self.wait_for(lambda: subscription.events == 3)
+        self.assertTrue(subscription.ready)
+
+        # The input is back to 0, but the pulse shows in the next snapshot only
+        self.assertEqual(self.client.get_snapshot().get_digital_input_state("1_01"), 1)
+        self.assertEqual(self.client.get_snapshot().get_digital_input_state("1_01"), 0)
+
+
+class SafetyInterlockTests(SimpleTestCase):
+    def setUp(self):
+        self.server = EvokStandIn(latency=0.005)
+        self.server.add_device("di", "1_01", value=0)
+        self.server.add_devices("ro", ["2_01", "2_02", "3_01", "3_02"], value=1)
+        self.client = EvokClient(self.server.start_in_thread(), retries=1)
+        self.interlock = SafetyInterlock(self.client, ["1_01"], lambda: ["2_01", "2_02", "3_01", "3_02"], period=0.01)
+
+    def tearDown(self):
+        self.interlock.stop()
+        self.client.close()
+        self.server.stop_thread()
+
+    def test_trips_with_one_bulk_write_and_latches(self):
+        self.interlock.start()
+        time.sleep(0.05)
+        self.assertFalse(self.interlock.tripped)
+
+        self.server.set_value("di", "1_01", 1)
+        deadline = time.monotonic() + 1.0
+        while not self.interlock.tripped and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.interlock.stop()
+
+        self.assertEqual(self.server.bulk_count, 1)
+        self.assertEqual([self.server.devices[("ro", c)]["value"] for c in ("2_01", "2_02", "3_01", "3_02")], [0] * 4)
+        stats = self.interlock.get_stats()
+        self.assertEqual(stats["trips"], 1)
+        self.assertLess(stats["max_reaction"], 0.25)
+
+        # Latched: a reset is refused while the input is active, accepted once released
+        self.interlock.request_reset()
+        self.assertTrue(self.interlock.poll())
+        self.server.set_value("di", "1_01", 0)
+        self.assertTrue(self.interlock.poll())
+        self.interlock.request_reset()
+        self.assertFalse(self.interlock.poll())
+        self.assertEqual(self.interlock.trips, 1)
+
+    def test_trip_waits_for_an_in_flight_commit(self):
+        circuits = ["2_01", "2_02", "3_01", "3_02"]
+        for circuit in circuits:
+            self.server.devices[("ro", circuit)]["value"] = 0
+        writes = SlowWrites(self.client, delay=0.1)
+        reconciler = OutputReconciler(writes)
+        reconciler.inhibit = self.interlock.is_tripped
+        self.interlock.write_lock = reconciler.write_lock
+        for circuit in circuits:
+            reconciler.set(circuit, True)
+
+        commit = threading.Thread(target=reconciler.commit)
+        commit.start()
+        writes.started.wait()
+        self.interlock.trip("Test trip")
+        commit.join()
+
+        # The controller's write landed first, so the off-write still wins
+        self.assertEqual([self.server.devices[("ro", c)]["value"] for c in circuits], [0] * 4)
+        self.assertEqual(reconciler.commit(), {circuit: False for circuit in circuits})
+
+
+class SlowWrites:
+    """Client wrapper whose writes stay in flight for a while."""
+
+    def __init__(self, client, delay):
+        self.client = client
+        self.delay = delay
+        self.started = threading.Event()
+
+    def write_outputs(self, values):
+        self.started.set()
+        time.sleep(self.delay)
+        return self.client.write_outputs(values)
+
+
+class StatusApiTests(TestCase):
+    def setUp(self):
+        for i in range(10):
+            sensor = Sensor.objects.create(name=f"S{i}", circuit=f"xG18_{i}", current_temperature=18.0 + i)
+            Tank.objects.create(name=f"T{i}", sensor=sensor, target_temperature=20.0)
+        Relay.objects.create(name="Alarm_Relay", circuit="2_01")
+
+    def test_field_selection(self):
+        response = self.client.get(reverse('tank-list'), {'fields': 'name,current_temperature'})
+
+        self.assertEqual(response.json()[0], {'name': "T0", 'current_temperature': 18.0})
+
+    def test_unchanged_poll_gets_304_without_queries(self):
+        response = self.client.get(reverse('sensor-list'))
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('sensor-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A state-only save, as the controller does, changes the version
+        relay = Relay.objects.get(name="Alarm_Relay")
+        relay.is_active = True
+        relay.save(update_fields=['is_active'])
+        response = self.client.get(reverse('sensor-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_responses_are_gzipped(self):
+        response = self.client.get(reverse('sensor-list'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 10)
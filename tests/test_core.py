@@ -0,0 +1,248 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest
+
+from api.evok_client import EvokSnapshot
+from core import controllers, metrics
+from core.alarms import AlarmEngine
+from core.log_sink import log_sink, reading_sink
+from core.metrics import count_queries
+from core.models import AlarmState, DigitalInput, Log, Relay, Sensor, Tank
+from core.registry import bump_file_version, file_version, registry
+from core.scheduler import Scheduler
+from core.utils import persist_dirty
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class SchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(clock=self.clock, sleep=self.clock.sleep)
+        self.calls = []
+
+    def run_for(self, seconds):
+        self.scheduler.run(should_stop=lambda: self.clock.now >= seconds)
+
+    def test_tasks_run_at_their_own_rate(self):
+        self.scheduler.add("fast", lambda: self.calls.append("fast"), 0.05)
+        self.scheduler.add("slow", lambda: self.calls.append("slow"), 1.0)
+
+        self.run_for(1.99)
+
+        self.assertEqual(self.calls.count("fast"), 40)
+        self.assertEqual(self.calls.count("slow"), 2)
+        self.assertEqual(self.calls[0], "fast")
+
+    def test_fixed_rate_does_not_drift(self):
+        def work():
+            self.calls.append(self.clock.now)
+            self.clock.now += 0.03
+
+        self.scheduler.add("work", work, 0.1)
+        self.run_for(0.95)
+
+        self.assertEqual(len(self.calls), 10)
+        self.assertAlmostEqual(self.calls[-1], 0.9)
+        self.assertEqual(self.scheduler.get_stats()["work"]["overruns"], 0)
+
+    def test_overrun_skips_missed_ticks(self):
+        def slow():
+            self.clock.now += 0.25
+
+        self.scheduler.add("slow", slow, 0.1)
+        self.run_for(0.95)
+
+        stats = self.scheduler.get_stats()["slow"]
+        self.assertEqual(stats["runs"], 4)
+        self.assertEqual(stats["overruns"], 4)
+        self.assertEqual(stats["skipped"], 8)
+
+
+class FileVersionTests(SimpleTestCase):
+    def test_concurrent_bumps(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "config.version")
+        errors = []
+
+        def bump():
+            try:
+                for _ in range(50):
+                    bump_file_version(path)
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertGreater(file_version(path), 0)
+        self.assertEqual(os.listdir(directory.name), ["config.version"])
+
+
+class PersistDirtyTests(TestCase):
+    def setUp(self):
+        Sensor.objects.create(name="S1", circuit="xG18_1")
+        Sensor.objects.create(name="S2", circuit="xG18_2")
+        Relay.objects.create(name="Alarm_Relay", circuit="2_01")
+        self.sensors = list(Sensor.objects.order_by("id"))
+        self.relay = Relay.objects.get()
+
+    def test_unchanged_rows_are_not_written(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(persist_dirty(self.sensors + [self.relay]), 0)
+
+    def test_only_changed_rows_are_written_in_one_transaction(self):
+        self.sensors[0].current_temperature = 18.5
+        self.relay.is_active = True
+
+        with self.assertNumQueries(4):  # savepoint, two bulk updates, release
+            self.assertEqual(persist_dirty(self.sensors + [self.relay]), 2)
+
+        self.assertEqual(Sensor.objects.get(name="S1").current_temperature, 18.5)
+        self.assertTrue(Relay.objects.get().is_active)
+        self.assertEqual(self.sensors[0].get_dirty_fields(), [])
+
+
+class ArchiveLogsTests(TestCase):
+    def test_old_rows_are_archived_and_deleted(self):
+        old = timezone.now() - timedelta(days=100)
+        Log.objects.bulk_create([Log(message=f"old {i}", timestamp=old) for i in range(7)])
+        Log.objects.create(message="new")
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            call_command('archive_logs', days=90, batch_size=3, pause=0, archive_dir=Path(archive_dir), stdout=StringIO())
+
+            [archive] = Path(archive_dir).iterdir()
+            with gzip.open(archive, 'rt') as f:
+                rows = [json.loads(line) for line in f]
+
+        self.assertEqual(sorted(row['message'] for row in rows), sorted(f"old {i}" for i in range(7)))
+        self.assertEqual(list(Log.objects.values_list('message', flat=True)), ["new"])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        sensor = Sensor.objects.create(name="S1", circuit="xG18_1", current_temperature=18.5)
+        Tank.objects.create(name="T1", sensor=sensor, target_temperature=18.0)
+        Relay.objects.create(name="Alarm_Relay", circuit="2_01", is_active=True)
+        registry.invalidate()
+        registry.ensure_loaded()
+        count_queries()
+        self.addCleanup(lambda: [connections[alias].execute_wrappers.remove(metrics._count_query)
+                                 for alias in connections if metrics._count_query in connections[alias].execute_wrappers])
+
+    def test_tasks_record_duration_and_queries(self):
+        task = metrics.instrument("test_task", lambda: (Sensor.objects.count(), Relay.objects.count()))
+        task()
+
+        text = generate_latest(REGISTRY).decode()
+        self.assertIn('controller_task_duration_seconds_count{task="test_task"} 1.0', text)
+        self.assertIn('controller_task_queries_sum{task="test_task"} 2.0', text)
+
+    def test_scrape_reports_device_state_without_queries(self):
+        collectors = CollectorRegistry()
+        collectors.register(metrics.ControllerCollector())
+
+        with self.assertNumQueries(0):
+            text = generate_latest(collectors).decode()
+
+        self.assertIn('tank_temperature_celsius{tank="T1"} 18.5', text)
+        self.assertIn('relay_active{relay="Alarm_Relay"} 1.0', text)
+        self.assertIn('controller_relay_writes_total', text)
+
+
+class UpdateSensorsTests(TestCase):
+    databases = {'default', 'history'}
+
+    def test_error_state_follows_every_sensor(self):
+        # No tank, so regulate_temperature never looks at this sensor
+        Sensor.objects.create(name="S1", circuit="xG18_1")
+        registry.invalidate()
+        registry.ensure_loaded()
+        sensor = registry.get(Sensor, name="S1")
+
+        controllers.update_sensors(EvokSnapshot([]))
+        self.assertTrue(sensor.error_active)
+        self.assertIsNotNone(sensor.last_error_time)
+
+        controllers.update_sensors(EvokSnapshot([{"dev": "data_point", "circuit": "xG18_1", "value": 18.5, "valid": True}]))
+        reading_sink.flush()
+        log_sink.flush()
+        self.assertFalse(Sensor.objects.get(name="S1").error_active)
+        self.assertIsNone(sensor.last_error_time)
+
+
+class AlarmEngineTests(TestCase):
+    def setUp(self):
+        self.sensor = Sensor.objects.create(name="S1", circuit="xG18_1", min_temp=5.0, max_temp=25.0)
+        DigitalInput.objects.create(name="Total_Stop_DI", circuit="1_01")
+        registry.invalidate()
+        registry.ensure_loaded()
+        self.start = timezone.now()
+
+    def evaluate(self, engine, seconds, value=18.0, valid=True, total_stop=0):
+        snapshot = EvokSnapshot([
+            {"dev": "data_point", "circuit": "xG18_1", "value": value, "valid": valid},
+            {"dev": "input", "circuit": "1_01", "value": total_stop},
+        ])
+        return engine.evaluate(registry, snapshot, now=self.start + timedelta(seconds=seconds))
+
+    def test_only_transitions_are_logged(self):
+        engine = AlarmEngine()
+        for second in range(0, 60, 5):
+            self.assertEqual(self.evaluate(engine, second, valid=False), [])
+        self.evaluate(engine, 61, valid=False)
+        self.evaluate(engine, 66, valid=False)
+        self.evaluate(engine, 70)
+        self.evaluate(engine, 75)
+
+        log_sink.flush()
+
+        key = f"sensor_invalid:{self.sensor.id}"
+        self.assertEqual(list(Log.objects.order_by('id').values_list('event', flat=True)),
+                         [f"Alarm raised: {key}", f"Alarm cleared: {key}"])
+
+    def test_pending_delay_survives_restart(self):
+        self.evaluate(AlarmEngine(), 0, value=30.0)
+
+        # A new engine (as after a restart) continues the 30 s delay
+        sounding = self.evaluate(AlarmEngine(), 31, value=30.0)
+        log_sink.flush()
+
+        key = f"temperature_range:{self.sensor.id}"
+        self.assertEqual([state.key for state in sounding], [key])
+        self.assertTrue(AlarmState.objects.get(key=key).active)
+
+    def test_digital_input_rule_does_not_sound(self):
+        engine = AlarmEngine()
+        self.assertEqual(self.evaluate(engine, 0, total_stop=1), [])
+        log_sink.flush()
+
+        state = AlarmState.objects.get(key__startswith="total_stop:")
+        self.assertTrue(state.active)
+        self.assertEqual(Log.objects.get().event, f"Alarm raised: {state.key}")
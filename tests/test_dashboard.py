@@ -0,0 +1,165 @@
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.live import StatePublisher
+from core.models import Log, Reading, Sensor, Tank
+from dashboard.live import LiveBroadcaster, LiveStream
+
+
+class TemperatureDataTests(TestCase):
+    databases = {'default', 'history'}
+
+    def setUp(self):
+        sensor = Sensor.objects.create(name="S1", circuit="xG18_1")
+        Tank.objects.create(name="T1", sensor=sensor)
+        self.now = time.time()
+        Reading.objects.bulk_create([
+            Reading(sensor_id=sensor.id, ts=self.now - 5000 + i, value=18.0 + (i % 50) / 10)
+            for i in range(5000)
+        ])
+
+    def test_series_is_downsampled_to_max_points(self):
+        response = self.client.get(reverse('temperature_data', args=["T1"]), {'max_points': 200})
+
+        data = response.json()
+        self.assertEqual(data['count'], 5000)
+        self.assertEqual(len(data['ts']), 200)
+        self.assertEqual(len(data['values']), 200)
+        self.assertEqual(data['ts'][0], self.now - 5000)
+        self.assertEqual(data['ts'][-1], self.now - 1)
+
+    def test_time_range(self):
+        response = self.client.get(reverse('temperature_data', args=["T1"]), {
+            'from': self.now - 100,
+            'to': self.now - 51,
+        })
+
+        data = response.json()
+        self.assertEqual(data['count'], 50)
+        self.assertEqual(len(data['ts']), 50)
+
+    def test_invalid_range_is_rejected(self):
+        response = self.client.get(reverse('temperature_data', args=["T1"]), {'from': 'yesterday'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+# Pages are rendered without a collectstatic manifest
+STATIC_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class TemperatureGraphTests(TestCase):
+    databases = {'default', 'history'}
+
+    def setUp(self):
+        self.sensor = Sensor.objects.create(name="S1", circuit="xG18_1")
+        Tank.objects.create(name="T1", sensor=self.sensor)
+        Reading.objects.create(sensor_id=self.sensor.id, ts=time.time() - 60, value=18.5)
+
+    def test_page_loads_plotly_as_static_file(self):
+        response = self.client.get(reverse('temperature_graph', args=["T1"]))
+
+        self.assertContains(response, '/static/js/plotly.min.js')
+        self.assertLess(len(response.content), 10000)
+
+    def test_figure_is_cached_until_a_new_reading_arrives(self):
+        url = reverse('temperature_figure', args=["T1"])
+        first = self.client.get(url).json()
+        self.assertEqual(first['data'][0]['y'], [18.5])
+
+        # A cache hit only looks up the newest reading id
+        with self.assertNumQueries(1, using='history'):
+            self.client.get(url)
+
+        Reading.objects.create(sensor_id=self.sensor.id, ts=time.time(), value=19.0)
+        self.assertEqual(self.client.get(url).json()['data'][0]['y'], [18.5, 19.0])
+
+
+class LiveBroadcasterTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "live_state.json")
+        self.publisher = StatePublisher(self.path)
+        self.broadcaster = LiveBroadcaster(self.path, interval=0)
+
+    def test_viewers_get_full_state_then_only_changes(self):
+        self.publisher.publish({"tank:1:temperature": 18.5, "relay:1": False, "alarm": False})
+        self.broadcaster.poll()
+        version, changes = self.broadcaster.changes_since(0)
+        self.assertEqual(changes, {"tank:1:temperature": 18.5, "relay:1": False, "alarm": False})
+
+        self.assertFalse(self.publisher.publish({"tank:1:temperature": 18.5, "relay:1": False, "alarm": False}))
+        self.publisher.publish({"tank:1:temperature": 18.6, "relay:1": False, "alarm": True})
+        self.publisher.publish({"tank:1:temperature": 18.7, "relay:1": False, "alarm": True})
+        self.broadcaster.poll()
+        self.broadcaster.poll()
+
+        self.assertEqual(self.publisher.writes, 3)
+        self.assertEqual(self.broadcaster.changes_since(version), (2, {"tank:1:temperature": 18.7, "alarm": True}))
+        self.assertEqual(self.broadcaster.changes_since(2), (2, None))
+
+    def test_stream_is_synchronous_under_wsgi(self):
+        self.publisher.publish({"tank:1:temperature": 18.5, "alarm": False})
+        chunks = LiveStream(self.broadcaster, interval=0).chunks()
+        self.assertEqual(next(chunks), 'id: 1\ndata: {"tank:1:temperature": 18.5, "alarm": false}\n\n')
+
+        # runserver cannot stream asynchronous iterators; it would buffer the stream forever
+        response = self.client.get(reverse('live_events'))
+        self.assertFalse(response.is_async)
+        response.close()
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class LogViewTests(TestCase):
+    def setUp(self):
+        self.sensor = Sensor.objects.create(name="S1", circuit="xG18_1")
+        self.tank = Tank.objects.create(name="T1", sensor=self.sensor)
+        start = timezone.now() - timedelta(hours=1)
+        # Pairs of rows share a timestamp, so paging has to use the id as tie-breaker
+        Log.objects.bulk_create([
+            Log(
+                tank=self.tank if i % 2 else None,
+                sensor=self.sensor,
+                event="Alarm triggered" if i % 10 == 0 else "temperature_reading",
+                timestamp=start + timedelta(seconds=i // 2),
+                message=f"row {i}",
+            )
+            for i in range(120)
+        ])
+
+    def test_keyset_pages_cover_every_row_once(self):
+        seen = []
+        url = reverse('log_view')
+        while url:
+            # Filter validation, the page, and the tank and sensor choices
+            with self.assertNumQueries(4):
+                response = self.client.get(url, {'sensor': self.sensor.id, 'size': 25} if '?' not in url else None)
+            seen += [log.message for log in response.context['logs']]
+            older_url = response.context.get('older_url')
+            url = reverse('log_view') + older_url if older_url else None
+
+        self.assertEqual(seen, [f"row {i}" for i in reversed(range(120))])
+        self.assertContains(response, "S1")
+
+    def test_filters_and_csv_export(self):
+        response = self.client.get(reverse('log_export'), {'tank': self.tank.id, 'event': 'alarm'})
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "timestamp,tank,sensor,event,temperature,valve_state,message")
+        # Odd rows have the tank; none of them is an alarm
+        self.assertEqual(len(lines), 1)
+
+        response = self.client.get(reverse('log_export'), {'event': 'alarm'})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([line.rsplit(",", 1)[1] for line in lines[1:]], [f"row {i}" for i in range(110, -1, -10)])